@@ -1,32 +1,104 @@
 """The Ultimate WhatsApp Home Assistant Bridge."""
+import asyncio
 import logging
 import aiohttp
-from homeassistant.core import HomeAssistant, ServiceCall
+from aiohttp import hdrs, web, WSMsgType
+from multidict import CIMultiDict
+from yarl import URL
+import time
+from urllib.parse import quote
+import voluptuous as vol
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse, callback
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.components.http import HomeAssistantView
 from homeassistant.helpers import config_validation as cv, device_registry as dr
-from .const import DOMAIN
+from .const import DOMAIN, DATA_VIEWS_REGISTERED
+from .engine import EngineClient, EngineError, EngineEventStream
+from .coordinator import WhatsAppInstancesCoordinator
+from .cache import ResponseCache, CachedResponse, cache_rule, make_etag, write_scope
+from .metrics import Metrics, endpoint_key
+from .gateway_ui import async_register_gateway
 
 _LOGGER = logging.getLogger(__name__)
 
 PLATFORMS = ["sensor", "binary_sensor"]
 
+# send_bulk: concurrent engine calls, retries only where no message can have gone out
+BULK_MAX_CONCURRENCY = 5
+BULK_MAX_ATTEMPTS = 3
+BULK_RETRY_DELAY = 1.0
+# Per-call durations above this are logged as warnings
+SLOW_CALL_SECONDS = 2.0
+
+def _require_message_for_recipients(data):
+    if "recipients" in data and "message" not in data:
+        raise vol.Invalid("'message' is required together with 'recipients'")
+    return data
+
+SEND_BULK_SCHEMA = vol.Schema(
+    vol.All(
+        {
+            vol.Optional("instance_id", default=1): vol.Coerce(int),
+            vol.Optional("recipients"): vol.All(cv.ensure_list, [cv.string]),
+            vol.Optional("message"): cv.string,
+            vol.Optional("messages"): [
+                vol.Schema({
+                    vol.Required("contact"): cv.string,
+                    vol.Required("message"): cv.string,
+                    vol.Optional("instance_id"): vol.Coerce(int),
+                })
+            ],
+            vol.Optional("max_concurrency", default=BULK_MAX_CONCURRENCY): vol.All(
+                vol.Coerce(int), vol.Range(min=1, max=50)
+            ),
+        },
+        cv.has_at_least_one_key("recipients", "messages"),
+        _require_message_for_recipients,
+    )
+)
+
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up WhatsApp Bridge from a config entry."""
     hass.data.setdefault(DOMAIN, {})
     
-    host = entry.data.get("engine_host", "localhost")
-    port = entry.data.get("engine_port", 5002)
-    api_key = entry.data.get("api_key", "")
-    
-    engine_url = f"http://{host}:{port}"
-    
-    session = aiohttp.ClientSession()
+    client = EngineClient(
+        entry.data.get("engine_host", "localhost"),
+        entry.data.get("engine_port", 5002),
+        entry.data.get("api_key", ""),
+    )
+    stream = EngineEventStream(client)
+    coordinator = WhatsAppInstancesCoordinator(hass, client, stream)
+    cache = ResponseCache()
     hass.data[DOMAIN][entry.entry_id] = {
-        "engine_url": engine_url,
-        "api_key": api_key,
-        "session": session
+        "client": client,
+        "stream": stream,
+        "coordinator": coordinator,
+        "cache": cache,
+        "proxy_metrics": Metrics(),
     }
+    # Runs on unload and also when setup fails below (e.g. ConfigEntryNotReady),
+    # so a retrying setup doesn't leak a session per attempt
+    entry.async_on_unload(client.async_close)
+    entry.async_on_unload(lambda: hass.data[DOMAIN].pop(entry.entry_id, None))
+
+    @callback
+    def _invalidate_cache(name, payload):
+        # Chat lists and message pages change whenever the engine sees traffic
+        if name in ("new_message", "chat_update") and isinstance(payload, dict):
+            cache.invalidate(payload.get("instanceId"))
+
+    entry.async_on_unload(stream.async_add_listener(_invalidate_cache))
+
+    async def _close_client(event):
+        await client.async_close()
+
+    entry.async_on_unload(hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _close_client))
+    entry.async_on_unload(coordinator.async_shutdown)
+
+    await coordinator.async_config_entry_first_refresh()
+    # Live status feed; cancelled automatically when the entry unloads
+    entry.async_create_background_task(hass, stream.async_run(), "whatsapp_hass engine event stream")
 
     # Register Panel
     # Note: We need to serve the frontend assets. 
@@ -48,49 +120,113 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
         # So we register a View that serves the HTML.
     )
 
-    # Register Proxy View
-    hass.http.register_view(WhatsAppProxyView(hass, engine_url, api_key))
+    # Register Proxy View and gateway dashboard (routes can't be removed, so only once per HA run)
+    if not hass.data.get(DATA_VIEWS_REGISTERED):
+        hass.http.register_view(WhatsAppProxyView(hass))
+        async_register_gateway(hass)
+        hass.data[DATA_VIEWS_REGISTERED] = True
 
     # --- SERVICES ---
-    async def engine_api_call(method: str, path: str, data: dict = None):
-        """Helper to call Node.js Engine."""
-        url = f"{engine_url}{path}"
-        headers = {"x-api-key": api_key}
-        try:
-            async with session.request(method, url, json=data, headers=headers, timeout=10) as response:
-                if response.status >= 400:
-                    _LOGGER.error(f"Engine API Error {response.status} on {path}")
-                    return None
-                return await response.json()
-        except Exception as e:
-            _LOGGER.error(f"Failed to communicate with Node Engine at {url}: {e}")
-            return None
-
     async def handle_send_message(call: ServiceCall):
         """Send a text message."""
         contact = call.data.get("contact")
         message = call.data.get("message")
         instance_id = call.data.get("instance_id", 1)
-        await engine_api_call("POST", "/api/send_message", {
+        await client.async_call("POST", "/api/send_message", {
             "instanceId": instance_id,
             "contact": contact,
             "message": message
         })
 
+    async def handle_send_bulk(call: ServiceCall):
+        """Send messages to many recipients concurrently; returns per-recipient results."""
+        instance_id = call.data["instance_id"]
+        jobs = [
+            {"instanceId": m.get("instance_id", instance_id), "contact": m["contact"], "message": m["message"]}
+            for m in call.data.get("messages", [])
+        ]
+        if call.data.get("recipients"):
+            jobs.extend(
+                {"instanceId": instance_id, "contact": contact, "message": call.data["message"]}
+                for contact in call.data["recipients"]
+            )
+
+        semaphore = asyncio.Semaphore(call.data["max_concurrency"])
+
+        async def send_one(payload):
+            result = {"contact": payload["contact"], "instance_id": payload["instanceId"], "success": False}
+            for attempt in range(1, BULK_MAX_ATTEMPTS + 1):
+                error = None
+                # Held per attempt only, so a recipient backing off frees its slot
+                async with semaphore:
+                    started = time.monotonic()
+                    try:
+                        await client.async_request("POST", "/api/send_message", payload)
+                        result["success"] = True
+                        result.pop("error", None)
+                    except EngineError as e:
+                        error = e
+                        result["error"] = str(e)
+                    elapsed = time.monotonic() - started
+                log = _LOGGER.warning if elapsed > SLOW_CALL_SECONDS else _LOGGER.debug
+                log(f"send_bulk to {payload['contact']} attempt {attempt} took {elapsed * 1000:.0f} ms")
+                result["attempts"] = attempt
+                result["duration_ms"] = round(elapsed * 1000)
+                if error is None or not error.retryable or attempt == BULK_MAX_ATTEMPTS:
+                    break
+                await asyncio.sleep(BULK_RETRY_DELAY * attempt)
+            if not result["success"]:
+                _LOGGER.error(f"send_bulk to {payload['contact']} failed: {result['error']}")
+            return result
+
+        started = time.monotonic()
+        results = await asyncio.gather(*(send_one(job) for job in jobs))
+        sent = sum(1 for r in results if r["success"])
+        _LOGGER.info(f"send_bulk: {sent}/{len(results)} sent in {time.monotonic() - started:.2f}s")
+        return {"sent": sent, "failed": len(results) - sent, "results": results}
+
     # Register Services
     hass.services.async_register(DOMAIN, "send_message", handle_send_message)
+    hass.services.async_register(
+        DOMAIN, "send_bulk", handle_send_bulk,
+        schema=SEND_BULK_SCHEMA, supports_response=SupportsResponse.OPTIONAL,
+    )
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Unload entry."""
-    data = hass.data[DOMAIN].pop(entry.entry_id)
-    await data["session"].close()
-    
-    hass.components.frontend.async_remove_panel("whatsapp")
-    
-    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unload_ok:
+        # hass.data and the client are released by the entry's on_unload callbacks
+        hass.components.frontend.async_remove_panel("whatsapp")
+
+    return unload_ok
+
+
+# The only browser headers passed to the engine. Anything else may be trusted
+# by the engine for identity (x-hass-user-id, x-hass-is-admin, ...) and is dropped;
+# the engine authenticates us by the client's x-api-key alone.
+FORWARDED_REQUEST_HEADERS = {
+    h.lower() for h in (
+        hdrs.CONTENT_TYPE, hdrs.CONTENT_LENGTH, hdrs.ACCEPT, hdrs.RANGE, hdrs.IF_NONE_MATCH,
+        hdrs.SEC_WEBSOCKET_PROTOCOL, hdrs.SEC_WEBSOCKET_VERSION, hdrs.SEC_WEBSOCKET_EXTENSIONS,
+    )
+}
+# Engine response headers that describe a single hop (or auth) and must not be passed back
+HOP_BY_HOP_HEADERS = {
+    h.lower() for h in (
+        hdrs.CONNECTION, hdrs.KEEP_ALIVE, hdrs.PROXY_AUTHENTICATE, hdrs.PROXY_AUTHORIZATION,
+        hdrs.TE, hdrs.TRAILER, hdrs.TRANSFER_ENCODING, hdrs.UPGRADE, hdrs.HOST,
+        hdrs.AUTHORIZATION, hdrs.COOKIE, hdrs.SET_COOKIE, "x-api-key",
+        # Let the engine answer uncompressed so bodies pass through byte-for-byte
+        hdrs.ACCEPT_ENCODING, hdrs.CONTENT_ENCODING,
+    )
+}
+# Streams may legitimately run long; only bound connecting to the engine
+PROXY_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=10)
+PROXY_CHUNK_SIZE = 64 * 1024
 
 
 class WhatsAppProxyView(HomeAssistantView):
@@ -99,33 +235,187 @@ class WhatsAppProxyView(HomeAssistantView):
     name = "api:whatsapp_proxy"
     requires_auth = True # HA Auth required!
 
-    def __init__(self, hass, engine_url, api_key):
+    def __init__(self, hass):
         self.hass = hass
-        self.engine_url = engine_url
-        self.api_key = api_key
-        self.session = aiohttp.ClientSession()
+
+    def _entry_data(self):
+        """hass.data of the loaded config entry, if any."""
+        for data in self.hass.data.get(DOMAIN, {}).values():
+            return data
+        return None
+
+    @staticmethod
+    def _target_url(client, request, path):
+        # socket.io lives at the engine root; everything else under /api
+        prefix = "" if path.startswith("socket.io") else "api/"
+        # Forward the path and query exactly as the browser encoded them
+        # (decoded, "%26" would split a parameter and "%23" start a fragment)
+        raw_path = request.rel_url.raw_path
+        mount = "/api/whatsapp_proxy/"
+        raw_path = raw_path[len(mount):] if raw_path.startswith(mount) else quote(path, safe="/@:")
+        url = f"{client.url}/{prefix}{raw_path}"
+        if request.rel_url.raw_query_string:
+            url = f"{url}?{request.rel_url.raw_query_string}"
+        return URL(url, encoded=True)
+
+    @staticmethod
+    def _request_headers(headers):
+        return CIMultiDict((k, v) for k, v in headers.items() if k.lower() in FORWARDED_REQUEST_HEADERS)
+
+    @staticmethod
+    def _response_headers(headers):
+        return CIMultiDict((k, v) for k, v in headers.items() if k.lower() not in HOP_BY_HOP_HEADERS)
 
     async def _handle(self, request, path):
-        # Forward request to Node Engine
-        target_url = f"{self.engine_url}/api/{path}"
-        
-        # Stream data? Or simple JSON?
-        # For simplicity, assume JSON for API calls.
-        # If we need websockets, that's harder in Python Views.
-        
-        method = request.method
-        data = None
-        if method in ['POST', 'PUT']:
-            data = await request.json()
-
-        headers = {"x-api-key": self.api_key}
-        
-        async with self.session.request(method, target_url, json=data, headers=headers) as resp:
-            # Forward response back to UI
-            text = await resp.text()
-            return aiohttp.web.Response(text=text, status=resp.status, content_type=resp.content_type)
+        # Forward request to Node Engine, streaming bodies in both directions
+        entry_data = self._entry_data()
+        if entry_data is None:
+            return web.Response(status=503, text="WhatsApp integration not loaded")
+        client = entry_data["client"]
+        target_url = self._target_url(client, request, path)
+
+        if request.headers.get(hdrs.UPGRADE, "").lower() == "websocket":
+            return await self._handle_websocket(client, request, target_url)
+        if path.startswith("socket.io"):
+            # Long-poll requests idle for up to pingInterval (25s); like the
+            # WebSockets above they're kept out of the latency metrics
+            return await self._forward(entry_data, request, path, target_url)
+
+        with entry_data["proxy_metrics"].track(endpoint_key(request.method, path)) as outcome:
+            response = await self._forward(entry_data, request, path, target_url)
+            outcome["error"] = response.status >= 500
+            return response
+
+    async def _forward(self, entry_data, request, path, target_url):
+        client = entry_data["client"]
+        cache = entry_data["cache"]
+        scope = None
+        if request.method == "GET":
+            rule = cache_rule(path)
+            if rule is not None:
+                return await self._handle_cached(client, cache, rule, request, target_url)
+        else:
+            scope = write_scope(path)
+
+        headers = self._request_headers(request.headers)
+        data = request.content if request.body_exists else None
+
+        if scope is not None:
+            # Sends and chat modifications make cached reads stale
+            cache.invalidate(None if scope == "*" else scope)
+        response = None
+        try:
+            async with client.session.request(
+                request.method, target_url, data=data, headers=headers,
+                timeout=PROXY_TIMEOUT, allow_redirects=False,
+            ) as resp:
+                if scope is not None:
+                    # Again now the engine has applied the write: a GET that ran
+                    # while it was in flight may have re-cached the old data
+                    cache.invalidate(None if scope == "*" else scope)
+                response = web.StreamResponse(status=resp.status, reason=resp.reason)
+                response.headers.update(self._response_headers(resp.headers))
+                if hdrs.CONTENT_ENCODING in resp.headers:
+                    # aiohttp already decoded the body, so the upstream length is wrong
+                    response.headers.popall(hdrs.CONTENT_LENGTH, None)
+                await response.prepare(request)
+                async for chunk in resp.content.iter_chunked(PROXY_CHUNK_SIZE):
+                    await response.write(chunk)
+                await response.write_eof()
+                if request.method != "GET" and path.startswith("instances"):
+                    # Instances added/removed through the panel; events don't report deletions
+                    self.hass.async_create_task(entry_data["coordinator"].async_request_refresh())
+                return response
+        except aiohttp.ClientError as e:
+            _LOGGER.error(f"Proxy request to {target_url} failed: {e}")
+            if response is not None and response.prepared:
+                # Headers are already out; all we can do is cut the body short
+                return response
+            return web.Response(status=502, text="Engine unavailable")
+
+    async def _handle_cached(self, client, cache, rule, request, target_url):
+        """Serve an idempotent GET from the cache, revalidating with the engine when stale."""
+        ttl, instance_id = rule
+        key = str(target_url)
+        entry = cache.get(key)
+
+        if entry is None or not entry.fresh:
+            headers = self._request_headers(request.headers)
+            # We answer the browser's conditional ourselves; ask the engine about our copy
+            headers.popall(hdrs.IF_NONE_MATCH, None)
+            if entry is not None:
+                headers[hdrs.IF_NONE_MATCH] = entry.etag
+            generation = cache.generation
+            try:
+                async with client.session.request("GET", target_url, headers=headers, timeout=PROXY_TIMEOUT) as resp:
+                    if resp.status == 304 and entry is not None:
+                        cache.touch(key, ttl)
+                        cache.revalidations += 1
+                        cache_status = "REVALIDATED"
+                    else:
+                        cache.misses += 1
+                        cache_status = "MISS"
+                        body = await resp.read()
+                        if resp.status != 200:
+                            return web.Response(body=body, status=resp.status, content_type=resp.content_type)
+                        entry = CachedResponse(
+                            status=resp.status,
+                            content_type=resp.headers.get(hdrs.CONTENT_TYPE, "application/json"),
+                            body=body,
+                            etag=resp.headers.get(hdrs.ETAG) or make_etag(body),
+                            instance_id=instance_id,
+                            expires=time.monotonic() + ttl,
+                        )
+                        cache.put(key, entry, generation)
+            except aiohttp.ClientError as e:
+                _LOGGER.error(f"Proxy request to {target_url} failed: {e}")
+                return web.Response(status=502, text="Engine unavailable")
+        else:
+            cache.hits += 1
+            cache_status = "HIT"
+
+        headers = {hdrs.ETAG: entry.etag, hdrs.CACHE_CONTROL: "no-cache", "X-Cache": cache_status}
+        if entry.etag in request.headers.get(hdrs.IF_NONE_MATCH, ""):
+            return web.Response(status=304, headers=headers)
+        headers[hdrs.CONTENT_TYPE] = entry.content_type
+        return web.Response(body=entry.body, status=entry.status, headers=headers)
+
+    async def _handle_websocket(self, client, request, target_url):
+        """Pipe a WebSocket (e.g. the engine's socket.io live feed) through HA auth."""
+        protocols = [p.strip() for p in request.headers.get(hdrs.SEC_WEBSOCKET_PROTOCOL, "").split(",") if p.strip()]
+        ws_server = web.WebSocketResponse(protocols=protocols, autoping=True)
+        await ws_server.prepare(request)
+
+        try:
+            async with client.session.ws_connect(
+                target_url, protocols=protocols, autoping=True,
+            ) as ws_client:
+
+                async def pump(source, target):
+                    async for msg in source:
+                        if msg.type == WSMsgType.TEXT:
+                            await target.send_str(msg.data)
+                        elif msg.type == WSMsgType.BINARY:
+                            await target.send_bytes(msg.data)
+                        else:
+                            break
+
+                tasks = [
+                    asyncio.create_task(pump(ws_server, ws_client)),
+                    asyncio.create_task(pump(ws_client, ws_server)),
+                ]
+                # Whichever side closes first ends the session for both
+                _, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in pending:
+                    task.cancel()
+        except aiohttp.ClientError as e:
+            _LOGGER.error(f"Proxy WebSocket to {target_url} failed: {e}")
+        finally:
+            await ws_server.close()
+        return ws_server
 
     async def get(self, request, path): return await self._handle(request, path)
     async def post(self, request, path): return await self._handle(request, path)
     async def delete(self, request, path): return await self._handle(request, path)
-    async def put(self, request, path): return await self._handle(request, path)
\ No newline at end of file
+    async def put(self, request, path): return await self._handle(request, path)
+    async def patch(self, request, path): return await self._handle(request, path)
@@ -1,12 +1,102 @@
 """Binary sensor platform for WhatsApp Pro."""
-from homeassistant.components.binary_sensor import BinarySensorEntity, BinarySensorDeviceClass
-from homeassistant.core import HomeAssistant
+from homeassistant.components.binary_sensor import BinarySensorEntity
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util
 from .const import DOMAIN
+from .coordinator import async_track_instances
+
+# Messages arriving within this window are folded into one state write
+COALESCE_WINDOW = 5
+# The sensor stays on until no message has arrived for this long
+ACTIVE_DURATION = 60
 
 async def async_setup_entry(hass: HomeAssistant, entry, async_add_entities):
     """Set up the binary sensor platform."""
-    # Note: We reuse the existing sensor logic/coordinator if needed, 
-    # but for simplicity, let's just use the main status sensor.
-    pass
+    data = hass.data[DOMAIN][entry.entry_id]
+    stream = data["stream"]
+    async_track_instances(
+        hass, entry, data["coordinator"],
+        lambda instance_id, instance: WhatsAppNewMessageBinarySensor(stream, instance_id, instance["name"]),
+        async_add_entities,
+    )
+
+class WhatsAppNewMessageBinarySensor(BinarySensorEntity):
+    """On while an instance is receiving inbound messages, fed from the engine's live events.
+    Our own sends and history sync are ignored."""
+
+    _attr_icon = "mdi:message-badge"
+    # Message text changes every burst; keep it out of the recorder
+    _unrecorded_attributes = frozenset({"last_message"})
+
+    def __init__(self, stream, instance_id, instance_name):
+        """Initialize the binary sensor."""
+        self._stream = stream
+        self.instance_id = instance_id
+        self._attr_name = f"WhatsApp {instance_name} New Message"
+        self._attr_unique_id = f"whatsapp_{instance_id}_new_message"
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, "engine")},
+        }
+        self._attr_is_on = False
+        self._attr_extra_state_attributes = {"message_count": 0}
+        self._pending = 0
+        self._pending_last = None
+        self._unsub_flush = None
+        self._unsub_off = None
+
+    @property
+    def should_poll(self):
+        return False
+
+    async def async_added_to_hass(self):
+        """Subscribe to the engine's new_message events."""
+        self.async_on_remove(self._stream.async_add_listener(self._handle_event))
+        self.async_on_remove(self._cancel_timers)
+
+    @callback
+    def _cancel_timers(self):
+        for unsub in (self._unsub_flush, self._unsub_off):
+            if unsub:
+                unsub()
+        self._unsub_flush = self._unsub_off = None
+
+    @callback
+    def _handle_event(self, name, payload):
+        if name != "new_message" or not isinstance(payload, dict) or payload.get("instanceId") != self.instance_id:
+            return
+        # The engine emits for every saved message; only live inbound ones count
+        if payload.get("is_from_me") or payload.get("is_history"):
+            return
+        # Only buffer here; the state machine sees one write per window
+        self._pending += 1
+        self._pending_last = payload
+        if self._unsub_flush is None:
+            self._unsub_flush = async_call_later(self.hass, COALESCE_WINDOW, self._flush)
+
+    @callback
+    def _flush(self, _now):
+        self._unsub_flush = None
+        last = self._pending_last
+        self._attr_is_on = True
+        self._attr_extra_state_attributes = {
+            # Messages received since the sensor last turned on
+            "message_count": self._attr_extra_state_attributes.get("message_count", 0) + self._pending,
+            "last_chat": last.get("jid"),
+            "last_message": last.get("text"),
+            "last_received": dt_util.utcnow().isoformat(),
+        }
+        self._pending = 0
+        self._pending_last = None
+
+        if self._unsub_off:
+            self._unsub_off()
+        self._unsub_off = async_call_later(self.hass, ACTIVE_DURATION, self._turn_off)
+        self.async_write_ha_state()
 
-# (Reserved for future specialized binary sensors like 'New Message Received')
+    @callback
+    def _turn_off(self, _now):
+        self._unsub_off = None
+        self._attr_is_on = False
+        self._attr_extra_state_attributes = {**self._attr_extra_state_attributes, "message_count": 0}
+        self.async_write_ha_state()
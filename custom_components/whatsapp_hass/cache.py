@@ -0,0 +1,130 @@
+"""In-memory response cache for read-heavy engine GET endpoints."""
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+import re
+import time
+
+# (path pattern, TTL seconds). Path is relative to the engine's /api prefix;
+# the first group is the instance id, used for targeted invalidation.
+CACHE_RULES = [
+    (re.compile(r"^chats/(\d+)$"), 10),
+    (re.compile(r"^contacts/(\d+)$"), 60),
+    # A chat's messages, but not messages/<id>/search
+    (re.compile(r"^messages/(\d+)/(?!search$)[^/]+$"), 5),
+]
+
+# Non-GET paths that never change cached data: socket.io long-poll POSTs
+# (sent every ping), logins and AI drafts
+NON_MUTATING_PREFIXES = ("socket.io", "auth/", "ai/")
+# Write paths that carry the instance id they modify
+_INSTANCE_WRITE = re.compile(r"^(?:chats|groups|instances|social/tracked)/(\d+)(?:/|$)")
+
+MAX_ENTRIES = 256
+MAX_TOTAL_BYTES = 16 * 1024 * 1024
+MAX_ENTRY_BYTES = 2 * 1024 * 1024
+
+
+@dataclass
+class CachedResponse:
+    status: int
+    content_type: str
+    body: bytes
+    etag: str
+    instance_id: str
+    expires: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires
+
+
+def cache_rule(path: str):
+    """Return (ttl, instance_id) if `path` is cacheable, else None."""
+    for pattern, ttl in CACHE_RULES:
+        match = pattern.match(path)
+        if match:
+            return ttl, match.group(1)
+    return None
+
+
+def write_scope(path: str):
+    """
+    What a non-GET to `path` makes stale: None for nothing, an instance id,
+    or "*" for everything (e.g. send_message, whose instance is in the body).
+    """
+    if path.startswith(NON_MUTATING_PREFIXES):
+        return None
+    match = _INSTANCE_WRITE.match(path)
+    return match.group(1) if match else "*"
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+class ResponseCache:
+    """Size-bounded LRU of engine responses with per-path TTLs."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_total_bytes=MAX_TOTAL_BYTES, max_entry_bytes=MAX_ENTRY_BYTES):
+        self.max_entries = max_entries
+        self.max_total_bytes = max_total_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.invalidations = 0
+        # Bumped by every invalidate(); see put()
+        self.generation = 0
+
+    def get(self, key: str):
+        """Return the cached entry for `key` (fresh or stale), or None."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CachedResponse, generation: int = None):
+        """Store `entry`. Pass the `generation` read before fetching it: if an
+        invalidation happened meanwhile, the response may predate a write and
+        is dropped."""
+        if len(entry.body) > self.max_entry_bytes:
+            return
+        if generation is not None and generation != self.generation:
+            return
+        self._pop(key)
+        self._entries[key] = entry
+        self._bytes += len(entry.body)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_total_bytes):
+            self._pop(next(iter(self._entries)))
+
+    def touch(self, key: str, ttl: float):
+        """Extend a stale entry after the engine confirmed it unchanged (304)."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.expires = time.monotonic() + ttl
+
+    def invalidate(self, instance_id=None):
+        """Drop entries for one instance, or everything."""
+        keys = [k for k, e in self._entries.items() if instance_id is None or e.instance_id == str(instance_id)]
+        for key in keys:
+            self._pop(key)
+        self.invalidations += 1
+        self.generation += 1
+
+    def _pop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry.body)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "invalidations": self.invalidations,
+        }
@@ -1,3 +1,6 @@
 """Constants for the WhatsApp integration."""
 
 DOMAIN = "whatsapp_hass"
+
+# hass.data key marking that the (entry independent) HTTP views are registered
+DATA_VIEWS_REGISTERED = f"{DOMAIN}_views_registered"
@@ -0,0 +1,123 @@
+"""Instance status coordinator for WhatsApp Pro."""
+import logging
+from datetime import timedelta
+import aiohttp
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from .engine import EngineClient, EngineError, EngineEventStream
+
+_LOGGER = logging.getLogger(__name__)
+
+UPDATE_TIMEOUT = aiohttp.ClientTimeout(total=5)
+# Only used while the live event stream is down
+FALLBACK_INTERVAL = timedelta(seconds=60)
+
+
+class WhatsAppInstancesCoordinator(DataUpdateCoordinator):
+    """
+    Keeps the engine's instance list up to date from its socket.io
+    `instances_status` events, polling /api/instances only as a fallback.
+    `data` is a dict of instance records keyed by instance id.
+    """
+
+    def __init__(self, hass: HomeAssistant, client: EngineClient, stream: EngineEventStream):
+        super().__init__(
+            hass,
+            _LOGGER,
+            name="whatsapp_instances",
+            update_interval=FALLBACK_INTERVAL,
+        )
+        self.client = client
+        self.stream = stream
+        self._unsub_stream = [
+            stream.async_add_listener(self._handle_event),
+            stream.async_add_connection_listener(self._handle_stream_state),
+        ]
+
+    async def _async_update_data(self):
+        """Fetch data from Node Engine."""
+        try:
+            instances = await self.client.async_request("GET", "/api/instances", timeout=UPDATE_TIMEOUT)
+            return {inst["id"]: inst for inst in instances}
+        except EngineError as err:
+            raise UpdateFailed(f"Error communicating with engine: {err}")
+
+    async def async_shutdown(self):
+        """Detach from the event stream and stop polling."""
+        for unsub in self._unsub_stream:
+            unsub()
+        self._unsub_stream = []
+        await super().async_shutdown()
+
+    @callback
+    def _handle_stream_state(self, connected: bool):
+        if connected:
+            # Events keep us current; stop the scheduled polling
+            self.update_interval = None
+            _LOGGER.debug("Engine event stream connected, polling paused")
+            # Catch up on anything missed while disconnected (and pick up names)
+            self.hass.async_create_task(self.async_request_refresh())
+        else:
+            self.update_interval = FALLBACK_INTERVAL
+            _LOGGER.debug("Engine event stream down, falling back to polling")
+            self.hass.async_create_task(self.async_request_refresh())
+
+    @callback
+    def _handle_event(self, name: str, payload):
+        if name != "instances_status" or not isinstance(payload, list) or self.data is None:
+            return
+
+        # Events carry status/presence/qr only; merge them into the full records.
+        # Unchanged records keep their identity so listeners can skip them cheaply.
+        merged = None
+        unknown = False
+        for update in payload:
+            inst = self.data.get(update.get("id"))
+            if inst is None:
+                unknown = True
+            elif any(inst.get(k) != v for k, v in update.items()):
+                if merged is None:
+                    merged = dict(self.data)
+                merged[inst["id"]] = {**inst, **update}
+
+        if unknown:
+            # New instance ids: fetch the full list to get their names
+            self.hass.async_create_task(self.async_request_refresh())
+        if merged is not None:
+            self.async_set_updated_data(merged)
+
+
+@callback
+def async_track_instances(hass: HomeAssistant, entry, coordinator, entity_factory, async_add_entities):
+    """
+    Keep one entity per engine instance: add entities for new instances and
+    remove those whose instance disappeared. `entity_factory(instance_id, record)`
+    builds the entity; it must expose `instance_id`.
+    """
+    entities = {}
+
+    @callback
+    def _sync_entities():
+        if coordinator.data is None:
+            return
+        new = [
+            entity_factory(instance_id, instance)
+            for instance_id, instance in coordinator.data.items()
+            if instance_id not in entities
+        ]
+        for entity in new:
+            entities[entity.instance_id] = entity
+        if new:
+            async_add_entities(new)
+
+        registry = er.async_get(hass)
+        for instance_id in [i for i in entities if i not in coordinator.data]:
+            entity = entities.pop(instance_id)
+            if entity.entity_id and registry.async_get(entity.entity_id):
+                registry.async_remove(entity.entity_id)
+            else:
+                hass.async_create_task(entity.async_remove())
+
+    _sync_entities()
+    entry.async_on_unload(coordinator.async_add_listener(_sync_entities))
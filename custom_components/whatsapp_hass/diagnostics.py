@@ -0,0 +1,21 @@
+"""Diagnostics support for WhatsApp Pro."""
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from .const import DOMAIN
+
+TO_REDACT = {"api_key"}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Return engine/proxy latency metrics and cache state for a config entry."""
+    data = hass.data[DOMAIN][entry.entry_id]
+    coordinator = data["coordinator"]
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "event_stream_connected": data["stream"].connected,
+        "instances": len(coordinator.data or {}),
+        "engine": data["client"].metrics.snapshot(),
+        "proxy": data["proxy_metrics"].snapshot(),
+        "proxy_cache": data["cache"].stats(),
+    }
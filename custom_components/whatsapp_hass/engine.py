@@ -0,0 +1,179 @@
+"""Client for the WhatsApp Node Engine shared by the integration's platforms."""
+import asyncio
+import json
+import logging
+import aiohttp
+from .metrics import Metrics, endpoint_key
+
+_LOGGER = logging.getLogger(__name__)
+
+# Connection pool tuning: the engine is a single local host, so a handful of
+# kept-alive sockets covers the panel, services and coordinator together.
+CONNECTION_LIMIT = 32
+CONNECTION_LIMIT_PER_HOST = 16
+KEEPALIVE_TIMEOUT = 60
+DNS_CACHE_TTL = 300
+
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=5)
+
+# Failures raised before a request reached the engine (aiohttp >= 3.10 has a
+# dedicated connect-timeout error; older versions report it as a plain timeout)
+CONNECT_ERRORS = (aiohttp.ClientConnectorError,) + (
+    (aiohttp.ConnectionTimeoutError,) if hasattr(aiohttp, "ConnectionTimeoutError") else ()
+)
+# Statuses with which the engine declined the call without acting on it
+RETRYABLE_STATUSES = (429, 503)
+
+
+class EngineError(Exception):
+    """Raised when the engine cannot be reached or answers with an error."""
+
+    def __init__(self, message: str, status: int = None, not_sent: bool = False):
+        super().__init__(message)
+        # HTTP status from the engine, or None if there was no response
+        self.status = status
+        # True if the request never reached the engine (connect failure)
+        self.not_sent = not_sent
+
+    @property
+    def retryable(self) -> bool:
+        """
+        Whether repeating the call is safe and may succeed. Timeouts and
+        dropped connections are not: the engine may already have acted
+        (e.g. delivered a message).
+        """
+        return self.not_sent or self.status in RETRYABLE_STATUSES
+
+
+class EngineClient:
+    """Owns the pooled aiohttp session used to talk to one engine."""
+
+    def __init__(self, host: str, port: int, api_key: str):
+        self.url = f"http://{host}:{port}"
+        self.api_key = api_key
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=CONNECTION_LIMIT,
+                limit_per_host=CONNECTION_LIMIT_PER_HOST,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=DNS_CACHE_TTL,
+            ),
+            timeout=DEFAULT_TIMEOUT,
+            # Sent on every request, so callers never build header dicts
+            headers={"x-api-key": api_key},
+        )
+        self.metrics = Metrics()
+
+    async def async_request(self, method: str, path: str, data: dict = None, timeout=None):
+        """Call the engine and return its decoded JSON body, raising EngineError on failure."""
+        url = f"{self.url}{path}"
+        with self.metrics.track(endpoint_key(method, path)):
+            try:
+                async with self.session.request(method, url, json=data, timeout=timeout or DEFAULT_TIMEOUT) as response:
+                    if response.status >= 400:
+                        raise EngineError(f"Engine API Error {response.status} on {path}", response.status)
+                    return await response.json()
+            except CONNECT_ERRORS as e:
+                raise EngineError(f"Failed to connect to Node Engine at {url}: {e}", not_sent=True) from e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                raise EngineError(f"Failed to communicate with Node Engine at {url}: {e}") from e
+
+    async def async_call(self, method: str, path: str, data: dict = None):
+        """Like async_request, but logs failures and returns None."""
+        try:
+            return await self.async_request(method, path, data)
+        except EngineError as e:
+            _LOGGER.error(str(e))
+            return None
+
+    async def async_close(self):
+        await self.session.close()
+
+
+# Reconnect backoff for the live event stream
+STREAM_BACKOFF_MIN = 1
+STREAM_BACKOFF_MAX = 60
+STREAM_HANDSHAKE_TIMEOUT = 10
+
+
+class EngineEventStream:
+    """
+    Minimal socket.io client (Engine.IO v4 over WebSocket) for the engine's
+    live events. Listeners are called with (event_name, payload); connection
+    listeners with True/False as the stream comes up or drops.
+    """
+
+    def __init__(self, client: EngineClient):
+        self.client = client
+        self.connected = False
+        self._listeners = []
+        self._connection_listeners = []
+
+    def async_add_listener(self, listener):
+        """Subscribe to events; returns a callable that unsubscribes."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def async_add_connection_listener(self, listener):
+        self._connection_listeners.append(listener)
+        return lambda: self._connection_listeners.remove(listener)
+
+    def _set_connected(self, connected: bool):
+        if connected != self.connected:
+            self.connected = connected
+            for listener in list(self._connection_listeners):
+                listener(connected)
+
+    async def async_run(self):
+        """Keep the stream connected until cancelled, backing off between attempts."""
+        backoff = STREAM_BACKOFF_MIN
+        while True:
+            try:
+                await self._async_connect_and_listen()
+                backoff = STREAM_BACKOFF_MIN
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                _LOGGER.debug(f"Engine event stream dropped: {e}")
+            except Exception:
+                # Anything else (e.g. WSMessageTypeError when the engine closes
+                # mid-handshake) must not end the task; reconnect as usual
+                _LOGGER.exception("Unexpected error in engine event stream")
+            finally:
+                self._set_connected(False)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, STREAM_BACKOFF_MAX)
+
+    async def _async_connect_and_listen(self):
+        url = f"{self.client.url}/socket.io/?EIO=4&transport=websocket"
+        async with self.client.session.ws_connect(url) as ws:
+            # Engine.IO open packet: 0{"sid":..,"pingInterval":..,"pingTimeout":..}
+            opening = await ws.receive_str(timeout=STREAM_HANDSHAKE_TIMEOUT)
+            if not opening.startswith("0"):
+                raise ValueError(f"Unexpected Engine.IO handshake: {opening[:20]}")
+            handshake = json.loads(opening[1:])
+            # The server pings every pingInterval; silence beyond that means it's gone
+            idle_timeout = (handshake.get("pingInterval", 25000) + handshake.get("pingTimeout", 20000)) / 1000
+
+            await ws.send_str("40")  # Socket.IO connect to the default namespace
+            while True:
+                msg = await ws.receive(timeout=idle_timeout)
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    return
+                data = msg.data
+                if data == "2":
+                    await ws.send_str("3")
+                elif data.startswith("40"):
+                    self._set_connected(True)
+                elif data.startswith("42"):
+                    # 42[<ack id>]["event", payload]
+                    event = json.loads(data[2:].lstrip("0123456789"))
+                    if isinstance(event, list) and event and isinstance(event[0], str):
+                        self._dispatch(event[0], event[1] if len(event) > 1 else None)
+                elif data.startswith("41") or data == "1":
+                    return
+
+    def _dispatch(self, name, payload):
+        for listener in list(self._listeners):
+            try:
+                listener(name, payload)
+            except Exception:
+                _LOGGER.exception(f"Error handling engine event {name}")
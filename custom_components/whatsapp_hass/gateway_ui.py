@@ -1,45 +1,269 @@
-from flask import Flask, render_template, request, jsonify
+"""Gateway dashboard served natively from Home Assistant's HTTP server."""
+import asyncio
+import hashlib
 import logging
 import os
+import aiohttp
+from aiohttp import hdrs, web
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from homeassistant.components.http import HomeAssistantView
+from homeassistant.core import HomeAssistant
+from .const import DOMAIN
+from .engine import EngineError
+
+_LOGGER = logging.getLogger(__name__)
 
 # Define paths relative to this file
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TEMPLATE_DIR = os.path.join(BASE_DIR, "templates")
-STATIC_DIR = os.path.join(BASE_DIR, "static")
 
-app = Flask(__name__, 
-            template_folder=TEMPLATE_DIR,
-            static_folder=STATIC_DIR)
+GATEWAY_URL = "/api/whatsapp_gateway"
+# Pages only change with the integration version; browsers revalidate via ETag
+PAGE_CACHE_CONTROL = "public, max-age=300"
+MESSAGES_LIMIT = 50
+# Drafting waits on Gemini, which regularly takes longer than the default engine timeout
+AI_TIMEOUT = aiohttp.ClientTimeout(total=60, connect=5)
+# Recent messages of the chat sent to the engine's AI as drafting context
+SUGGESTION_CONTEXT = 10
+
+
+def async_register_gateway(hass: HomeAssistant):
+    """Register the dashboard pages and their API views."""
+    pages = PageCache(hass)
+    hass.http.register_view(GatewayPageView(pages, "", "index.html"))
+    hass.http.register_view(GatewayPageView(pages, "/connect", "connect.html"))
+    for view in (
+        StartConnectionView, CheckLoginView, MessagesView, AccountStatusView, SendMessageView, SuggestionsView,
+    ):
+        hass.http.register_view(view(hass))
+
+
+def _entry_data(hass):
+    """hass.data of the loaded config entry, if any."""
+    for data in hass.data.get(DOMAIN, {}).values():
+        return data
+    return None
+
+
+class PageCache:
+    """Renders each template once (off the event loop) and keeps the bytes and ETag."""
+
+    def __init__(self, hass):
+        self.hass = hass
+        self._pages = {}
+        self._lock = asyncio.Lock()
+        self._env = Environment(loader=FileSystemLoader(TEMPLATE_DIR), autoescape=select_autoescape())
+
+    async def async_get(self, template):
+        page = self._pages.get(template)
+        if page is None:
+            async with self._lock:
+                page = self._pages.get(template)
+                if page is None:
+                    page = await self.hass.async_add_executor_job(self._render, template)
+                    self._pages[template] = page
+        return page
+
+    def _render(self, template):
+        body = self._env.get_template(template).render(base=GATEWAY_URL).encode()
+        return body, '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+
+class GatewayPageView(HomeAssistantView):
+    """Static dashboard page. Holds no data, so it's served without auth;
+    the page's API calls carry the HA token."""
+    requires_auth = False
+
+    def __init__(self, pages, path, template):
+        self.url = f"{GATEWAY_URL}{path}"
+        self.name = f"api:whatsapp_gateway:{template.split('.')[0]}"
+        self._pages = pages
+        self._template = template
+
+    async def get(self, request):
+        body, etag = await self._pages.async_get(self._template)
+        headers = {hdrs.ETAG: etag, hdrs.CACHE_CONTROL: PAGE_CACHE_CONTROL}
+        if etag in request.headers.get(hdrs.IF_NONE_MATCH, ""):
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=body, content_type="text/html", charset="utf-8", headers=headers)
+
+
+class GatewayApiView(HomeAssistantView):
+    """Base for the dashboard's API endpoints, backed by the engine."""
+    requires_auth = True
+
+    def __init__(self, hass):
+        self.hass = hass
+
+    def _data(self):
+        data = _entry_data(self.hass)
+        if data is None:
+            raise web.HTTPServiceUnavailable(text="WhatsApp integration not loaded")
+        return data
+
+    def _instances(self, account=None):
+        instances = self._data()["coordinator"].data or {}
+        return [inst for inst in instances.values() if not account or inst.get("name") == account]
+
+
+def _login_state(instance):
+    if instance.get("status") == "connected":
+        return {"status": "logged_in", "qr_code": None}
+    qr = instance.get("qr")
+    if qr:
+        # The engine sends a data URL; the page expects bare base64
+        return {"status": "qr_ready", "qr_code": qr.split(",", 1)[-1]}
+    return {"status": "launching", "qr_code": None}
+
+
+class StartConnectionView(GatewayApiView):
+    url = f"{GATEWAY_URL}/api/start_connection"
+    name = "api:whatsapp_gateway:start_connection"
+
+    async def post(self, request):
+        """
+        Reconnect the named account, or an unlinked instance left over from an
+        earlier attempt, and only create a new instance if there is none;
+        QR codes follow via check_login.
+        """
+        body = await request.json() if request.body_exists else {}
+        account = body.get("account")
+        data = self._data()
+        if account:
+            existing = self._instances(account)
+        else:
+            existing = [inst for inst in self._instances() if inst.get("status") != "connected"]
+        if existing and existing[0].get("status") == "connected":
+            inst = existing[0]
+            return self.json({"status": "logged_in", "account": inst.get("name"), "instance_id": inst["id"]})
+        try:
+            if existing:
+                instance_id = existing[0]["id"]
+                account = existing[0].get("name")
+                await data["client"].async_request("POST", f"/api/instances/{instance_id}/reconnect")
+            else:
+                account = account or f"WhatsApp {len(self._instances()) + 1}"
+                created = await data["client"].async_request("POST", "/api/instances", {"name": account})
+                instance_id = created["id"]
+        except EngineError as e:
+            return self.json({"error": str(e)}, status_code=502)
+
+        self.hass.async_create_task(data["coordinator"].async_request_refresh())
+        return self.json({"status": "launching", "account": account, "instance_id": instance_id}, status_code=202)
+
+
+class CheckLoginView(GatewayApiView):
+    url = f"{GATEWAY_URL}/api/check_login"
+    name = "api:whatsapp_gateway:check_login"
+
+    async def get(self, request):
+        # Served from the coordinator, which the engine's live feed keeps current
+        instance_id = request.query.get("instance_id")
+        instances = self._data()["coordinator"].data or {}
+        instance = instances.get(int(instance_id)) if instance_id and instance_id.isdigit() else None
+        if instance is None:
+            return self.json({"status": "not_started"})
+        return self.json({"account": instance.get("name"), **_login_state(instance)})
+
+
+class MessagesView(GatewayApiView):
+    url = f"{GATEWAY_URL}/api/messages"
+    name = "api:whatsapp_gateway:messages"
+
+    async def get(self, request):
+        """Latest message per chat across accounts, newest first."""
+        client = self._data()["client"]
+        instances = self._instances(request.query.get("account"))
+        results = await asyncio.gather(
+            *(client.async_request("GET", f"/api/chats/{inst['id']}") for inst in instances),
+            return_exceptions=True,
+        )
+        messages = []
+        for inst, chats in zip(instances, results):
+            if isinstance(chats, Exception):
+                _LOGGER.error(f"Failed to load chats for {inst.get('name')}: {chats}")
+                continue
+            messages.extend(
+                {
+                    "account": inst.get("name"),
+                    "chat_name": chat.get("name"),
+                    "sender": chat.get("name"),
+                    "text": chat.get("last_message_text"),
+                    "timestamp": chat.get("last_message_timestamp"),
+                }
+                for chat in chats
+                if chat.get("last_message_text")
+            )
+        messages.sort(key=lambda m: m["timestamp"] or 0, reverse=True)
+        return self.json(messages[:MESSAGES_LIMIT])
+
+
+class AccountStatusView(GatewayApiView):
+    url = f"{GATEWAY_URL}/api/account_status"
+    name = "api:whatsapp_gateway:account_status"
+
+    async def get(self, request):
+        return self.json([
+            {
+                "account": inst.get("name"),
+                "status": "online" if inst.get("status") == "connected" else "offline",
+                "presence": inst.get("presence"),
+            }
+            for inst in self._instances()
+        ])
 
-# Shared state
-hass_instance = None
 
-def start_gateway(hass, client=None):
-    global hass_instance
-    hass_instance = hass
-    # Run Flask
-    app.run(host='0.0.0.0', port=5001, debug=False, use_reloader=False)
+class SendMessageView(GatewayApiView):
+    url = f"{GATEWAY_URL}/api/send_message"
+    name = "api:whatsapp_gateway:send_message"
 
-@app.route('/')
-def index():
-    return render_template('index.html')
+    async def post(self, request):
+        body = await request.json()
+        sender, contact, message = body.get("sender"), body.get("contact"), body.get("message")
+        if not sender or not contact or not message:
+            return self.json({"error": "Sender, contact, and message are required"}, status_code=400)
 
-@app.route('/connect')
-def connect():
-    return "<h1>Server Connection Not Supported</h1><p>Your Home Assistant server lacks the required browser environment. Please run the connection gateway on your Windows PC.</p>"
+        instances = self._instances(sender)
+        if not instances:
+            return self.json({"error": f"Unknown account {sender}"}, status_code=404)
+        try:
+            await self._data()["client"].async_request("POST", "/api/send_message", {
+                "instanceId": instances[0]["id"],
+                "contact": contact,
+                "message": message,
+            })
+        except EngineError as e:
+            return self.json({"error": str(e)}, status_code=502)
+        return self.json({"success": True})
 
-@app.route('/api/start_connection', methods=['POST'])
-def start_connection():
-    return jsonify({"error": "Browser not available on this server"}), 500
 
-@app.route('/api/check_login', methods=['GET'])
-def check_login():
-    return jsonify({"status": "error", "message": "Browser not available"})
+class SuggestionsView(GatewayApiView):
+    url = f"{GATEWAY_URL}/api/generate_suggestions"
+    name = "api:whatsapp_gateway:generate_suggestions"
 
-@app.route('/api/messages', methods=['GET'])
-def get_messages():
-    return jsonify([])
+    async def post(self, request):
+        """Reply draft for a chat from the engine's AI, built from the chat's history there."""
+        body = await request.json()
+        sender, contact = body.get("sender"), body.get("contact")
+        if not sender or not contact:
+            return self.json({"error": "Sender and contact are required"}, status_code=400)
 
-@app.route('/api/account_status', methods=['GET'])
-def get_account_status():
-    return jsonify([{"account": "Server", "status": "online", "last_seen": "Now"}])
+        instances = self._instances(sender)
+        if not instances:
+            return self.json({"error": f"Unknown account {sender}"}, status_code=404)
+        instance_id = instances[0]["id"]
+        client = self._data()["client"]
+        try:
+            chats = await client.async_request("GET", f"/api/chats/{instance_id}")
+            chat = next((c for c in chats if contact in (c.get("name"), c.get("jid"))), None)
+            if chat is None:
+                return self.json({"error": f"No chat with {contact}"}, status_code=404)
+            # Oldest first, as the engine returns them
+            messages = await client.async_request("GET", f"/api/messages/{instance_id}/{chat['jid']}")
+            result = await client.async_request(
+                "POST", "/api/ai/draft", {"messages": messages[-SUGGESTION_CONTEXT:], "steer": body.get("steer")},
+                timeout=AI_TIMEOUT,
+            )
+        except EngineError as e:
+            return self.json({"error": str(e)}, status_code=502)
+        return self.json([result["draft"]])
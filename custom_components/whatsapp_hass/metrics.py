@@ -0,0 +1,102 @@
+"""Lightweight per-endpoint latency metrics for engine and proxy calls."""
+from collections import deque
+from contextlib import contextmanager
+import re
+import time
+
+# Latency samples kept per endpoint; percentiles are computed over these
+SAMPLE_SIZE = 512
+
+_JID = re.compile(r"/[^/]+@[^/]+")
+_NUMERIC = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_key(method: str, path: str) -> str:
+    """Collapse ids and JIDs so one route maps to one metrics bucket."""
+    path = path.split("?", 1)[0]
+    path = _JID.sub("/:jid", path)
+    path = _NUMERIC.sub("/:id", path)
+    return f"{method} {path}"
+
+
+def _percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, int(round(pct / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+class EndpointStats:
+    """Counters and a bounded window of latencies (seconds) for one endpoint."""
+    __slots__ = ("count", "errors", "total_time", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def as_dict(self):
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avg_ms": round(self.total_time / self.count * 1000, 1) if self.count else None,
+            "p50_ms": _ms(_percentile(ordered, 50)),
+            "p95_ms": _ms(_percentile(ordered, 95)),
+            "p99_ms": _ms(_percentile(ordered, 99)),
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+class Metrics:
+    """
+    Collects call counts, error counts and latencies per endpoint. Recording
+    is O(1); percentiles are only computed when diagnostics are read.
+    """
+
+    def __init__(self):
+        self._endpoints = {}
+        self.in_flight = 0
+
+    def record(self, key: str, seconds: float, error: bool = False):
+        stats = self._endpoints.get(key)
+        if stats is None:
+            stats = self._endpoints[key] = EndpointStats()
+        stats.count += 1
+        stats.total_time += seconds
+        stats.samples.append(seconds)
+        if error:
+            stats.errors += 1
+
+    @contextmanager
+    def track(self, key: str):
+        """Time a block; exceptions count as errors. Yields a dict whose
+        'error' flag the caller can set for error responses."""
+        outcome = {"error": False}
+        started = time.monotonic()
+        self.in_flight += 1
+        try:
+            yield outcome
+        except BaseException:
+            outcome["error"] = True
+            raise
+        finally:
+            self.in_flight -= 1
+            self.record(key, time.monotonic() - started, outcome["error"])
+
+    def percentile_ms(self, pct: float, prefix: str = ""):
+        """Percentile across all endpoints whose key starts with `prefix`."""
+        samples = sorted(
+            s for key, stats in self._endpoints.items() if key.startswith(prefix) for s in stats.samples
+        )
+        return _ms(_percentile(samples, pct))
+
+    def snapshot(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "endpoints": {key: stats.as_dict() for key, stats in sorted(self._endpoints.items())},
+        }
@@ -1,45 +1,42 @@
 """Sensor platform for WhatsApp Pro."""
 import logging
-from homeassistant.components.sensor import SensorEntity
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-from homeassistant.core import HomeAssistant
 from datetime import timedelta
-import aiohttp
+from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.const import EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
 from .const import DOMAIN
+from .coordinator import async_track_instances
 
 _LOGGER = logging.getLogger(__name__)
 
+# Only the diagnostic metric sensors poll; they read in-memory counters
+SCAN_INTERVAL = timedelta(seconds=30)
+
 async def async_setup_entry(hass: HomeAssistant, entry, async_add_entities):
     """Set up the sensor platform."""
-    data = hass.data[DOMAIN][entry.entry_id]
-    engine_url = data["engine_url"]
-    session = data["session"]
-
-    async def async_update_data():
-        """Fetch data from Node Engine."""
-        try:
-            async with session.get(f"{engine_url}/api/instances", timeout=5) as response:
-                if response.status != 200:
-                    raise UpdateFailed(f"Error {response.status}")
-                return await response.json()
-        except Exception as err:
-            raise UpdateFailed(f"Error communicating with engine: {err}")
-
-    coordinator = DataUpdateCoordinator(
-        hass,
-        _LOGGER,
-        name="whatsapp_instances",
-        update_method=async_update_data,
-        update_interval=timedelta(seconds=10),
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    async_track_instances(
+        hass, entry, coordinator,
+        lambda instance_id, instance: WhatsAppInstanceSensor(coordinator, instance_id, instance["name"]),
+        async_add_entities,
     )
 
-    await coordinator.async_config_entry_first_refresh()
-
-    entities = []
-    for instance in coordinator.data:
-        entities.append(WhatsAppInstanceSensor(coordinator, instance["id"], instance["name"]))
-    
-    async_add_entities(entities)
+    client = hass.data[DOMAIN][entry.entry_id]["client"]
+    proxy_metrics = hass.data[DOMAIN][entry.entry_id]["proxy_metrics"]
+    async_add_entities([
+        WhatsAppMetricSensor(
+            "engine_p95_latency", "WhatsApp Engine p95 Latency", UnitOfTime.MILLISECONDS,
+            lambda: client.metrics.percentile_ms(95),
+        ),
+        WhatsAppMetricSensor(
+            "proxy_p95_latency", "WhatsApp Proxy p95 Latency", UnitOfTime.MILLISECONDS,
+            lambda: proxy_metrics.percentile_ms(95),
+        ),
+        WhatsAppMetricSensor(
+            "proxy_in_flight", "WhatsApp Proxy In-Flight Requests", None,
+            lambda: proxy_metrics.in_flight,
+        ),
+    ])
 
 class WhatsAppInstanceSensor(SensorEntity):
     """Representation of a WhatsApp Instance Status sensor."""
@@ -54,30 +51,70 @@ class WhatsAppInstanceSensor(SensorEntity):
         self._attr_device_info = {
             "identifiers": {(DOMAIN, "engine")},
         }
+        self._last_written = None
+
+    @property
+    def _instance(self):
+        return (self.coordinator.data or {}).get(self.instance_id)
 
     @property
     def state(self):
         """Return the state of the sensor."""
-        for inst in self.coordinator.data:
-            if inst["id"] == self.instance_id:
-                return inst["status"]
-        return "unknown"
+        inst = self._instance
+        return inst["status"] if inst else "unknown"
 
     @property
     def extra_state_attributes(self):
         """Return extra attributes."""
-        for inst in self.coordinator.data:
-            if inst["id"] == self.instance_id:
-                return {
-                    "presence": inst.get("presence", "unknown"),
-                    "instance_id": self.instance_id
-                }
-        return {}
+        inst = self._instance
+        if not inst:
+            return {}
+        return {
+            "presence": inst.get("presence", "unknown"),
+            "instance_id": self.instance_id
+        }
 
     @property
     def should_poll(self):
         return False
 
+    @callback
+    def _handle_coordinator_update(self):
+        """Write state only when this instance's status or presence changed."""
+        inst = self._instance
+        snapshot = (inst.get("status"), inst.get("presence")) if inst else None
+        if snapshot == self._last_written:
+            return
+        self._last_written = snapshot
+        self.async_write_ha_state()
+
     async def async_added_to_hass(self):
         """Connect to coordinator update signal."""
-        self.async_on_remove(self.coordinator.async_add_listener(self.async_write_ha_state))
+        self.async_on_remove(self.coordinator.async_add_listener(self._handle_coordinator_update))
+        inst = self._instance
+        self._last_written = (inst.get("status"), inst.get("presence")) if inst else None
+
+
+class WhatsAppMetricSensor(SensorEntity):
+    """Diagnostic sensor exposing an engine/proxy performance metric (disabled by default)."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, key, name, unit, value_fn):
+        """Initialize the sensor."""
+        self._value_fn = value_fn
+        self._attr_name = name
+        self._attr_unique_id = f"whatsapp_{key}"
+        self._attr_native_unit_of_measurement = unit
+        self._attr_device_info = {
+            "identifiers": {(DOMAIN, "engine")},
+        }
+
+    @property
+    def should_poll(self):
+        return True
+
+    async def async_update(self):
+        self._attr_native_value = self._value_fn()
@@ -0,0 +1,56 @@
+        const BASE = '{{ base }}';
+        // Same-origin page inside Home Assistant. Auth comes from the HA frontend
+        // when embedded in it (e.g. an iframe panel), otherwise from the stored
+        // login, whose 30-minute access token is refreshed with its refresh_token.
+        function frontendAuth() {
+            try {
+                const ha = window.parent !== window && window.parent.document.querySelector('home-assistant');
+                return (ha && ha.hass && ha.hass.auth) || null;
+            } catch (e) {
+                return null;
+            }
+        }
+
+        async function refreshStoredTokens(tokens) {
+            const response = await fetch('/auth/token', {
+                method: 'POST',
+                body: new URLSearchParams({
+                    grant_type: 'refresh_token',
+                    client_id: tokens.clientId,
+                    refresh_token: tokens.refresh_token
+                })
+            });
+            if (!response.ok) return null;
+            const fresh = await response.json();
+            const updated = Object.assign({}, tokens, fresh, { expires: Date.now() + fresh.expires_in * 1000 });
+            localStorage.setItem('hassTokens', JSON.stringify(updated));
+            return updated;
+        }
+
+        async function accessToken(forceRefresh) {
+            const auth = frontendAuth();
+            if (auth) {
+                if (forceRefresh || auth.expired) await auth.refreshAccessToken();
+                return auth.accessToken;
+            }
+            let tokens = JSON.parse(localStorage.getItem('hassTokens') || 'null');
+            if (!tokens || !tokens.refresh_token) return tokens && tokens.access_token;
+            if (forceRefresh || !tokens.expires || tokens.expires < Date.now() + 30000) {
+                tokens = await refreshStoredTokens(tokens);
+            }
+            return tokens && tokens.access_token;
+        }
+
+        async function apiFetch(path, options = {}, isRetry = false) {
+            const token = await accessToken(isRetry);
+            const headers = Object.assign({}, options.headers);
+            if (token) headers['Authorization'] = `Bearer ${token}`;
+            const response = await fetch(BASE + path, Object.assign({}, options, { headers }));
+            if (response.status === 401 && !isRetry) return apiFetch(path, options, true);
+            if (response.status === 401 && !document.getElementById('auth-hint')) {
+                document.body.insertAdjacentHTML('afterbegin',
+                    '<p id="auth-hint" style="text-align:center;color:#c00;">Not signed in to Home Assistant. ' +
+                    'Log in with "Keep me logged in", or open this page from a Home Assistant panel.</p>');
+            }
+            return response;
+        }
@@ -64,7 +64,7 @@ export class MessageManager {
         // 3. Process historical messages
         if (messages) {
             console.log(`[Sync ${this.instanceId}]: Saving ${messages.length} historical messages...`);
-            for (const msg of messages) await this.saveMessageToDb(msg);
+            for (const msg of messages) await this.saveMessageToDb(msg, true);
         }
         this.io.emit('chat_update', { instanceId: this.instanceId });
     }
@@ -167,8 +167,10 @@ export class MessageManager {
 
     // --- LOGIC HELPERS ---
 
-    async handleIncomingMessages(m: { messages: WAMessage[] }) {
-        for (const msg of m.messages) await this.saveMessageToDb(msg);
+    async handleIncomingMessages(m: { messages: WAMessage[], type?: string }) {
+        // 'append' upserts are catch-up/sync, not messages arriving now
+        const isHistory = m.type === 'append';
+        for (const msg of m.messages) await this.saveMessageToDb(msg, isHistory);
         this.io.emit('chat_update', { instanceId: this.instanceId });
     }
 
@@ -188,7 +190,7 @@ export class MessageManager {
         return jid;
     }
 
-    async saveMessageToDb(m: WAMessage) {
+    async saveMessageToDb(m: WAMessage, isHistory = false) {
         try {
             const message = m.message;
             if (!message) return;
@@ -339,7 +341,7 @@ export class MessageManager {
             `).run(this.instanceId, jid, chatIdentityName, 0, timestamp);
 
             db.prepare('UPDATE chats SET last_message_text = ?, last_message_timestamp = ? WHERE instance_id = ? AND jid = ?').run(text || `[${type}]`, timestamp, this.instanceId, jid);
-            this.io.emit('new_message', { instanceId: this.instanceId, jid, text });
+            this.io.emit('new_message', { instanceId: this.instanceId, jid, text, is_from_me: !!is_from_me, is_history: isHistory });
         } catch (err) {
             console.error(`[MessageManager ${this.instanceId}]: CRITICAL Error saving message:`, err);
         }
@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response
 import requests
 import logging
 import time
@@ -7,7 +7,9 @@ import json
 import sqlite3
 import google.generativeai as genai
 from datetime import datetime
-from whatsapp_web_client import WhatsAppWebClient
+from login_manager import LoginManager, DEFAULT_ACCOUNT, FINAL_STATES
+from messages import Message
+from conversation_context import ConversationContext, DEFAULT_MAX_MESSAGES, DEFAULT_TOKEN_BUDGET
 import threading
 
 app = Flask(__name__)
@@ -17,9 +19,8 @@ CONFIG_FILE = 'config.json'
 DB_FILE = 'whatsapp.db'
 config = {}
 
-# Global Client Instance for Gateway Mode
-whatsapp_client = None
-client_lock = threading.Lock()
+# Browser login jobs for Gateway Mode, one per account
+login_manager = LoginManager()
 
 def load_config():
     global config
@@ -34,7 +35,9 @@ def load_config():
         config = {
             "ha_url": "",
             "ha_token": "",
-            "gemini_api_key": ""
+            "gemini_api_key": "",
+            "suggestion_context_messages": DEFAULT_MAX_MESSAGES,
+            "suggestion_token_budget": DEFAULT_TOKEN_BUDGET
         }
 
 def save_config(new_config):
@@ -54,6 +57,13 @@ def save_config(new_config):
         logging.error(f"Failed to save config: {e}")
 
 # Database Initialization
+def _epoch(stored_timestamp):
+    """Epoch seconds of a stored timestamp; unreadable ones (e.g. "Unknown") sort as oldest."""
+    try:
+        return datetime.fromisoformat(stored_timestamp).timestamp()
+    except (TypeError, ValueError):
+        return 0.0
+
 def init_db():
     conn = sqlite3.connect(DB_FILE)
     c = conn.cursor()
@@ -65,7 +75,18 @@ def init_db():
                   sender TEXT,
                   text TEXT,
                   timestamp TEXT,
+                  epoch REAL,
                   UNIQUE(account, chat_name, timestamp, text))''')
+    # `timestamp` is display text (ISO, or whatever the page showed); `epoch` orders by time
+    if "epoch" not in [row[1] for row in c.execute("PRAGMA table_info(messages)")]:
+        c.execute("ALTER TABLE messages ADD COLUMN epoch REAL")
+        rows = c.execute("SELECT id, timestamp FROM messages").fetchall()
+        c.executemany("UPDATE messages SET epoch = ? WHERE id = ?",
+                      [(_epoch(timestamp), row_id) for row_id, timestamp in rows])
+    # Serves per-chat history lookups by time (suggestion context)
+    c.execute("DROP INDEX IF EXISTS idx_messages_chat")
+    c.execute("DROP INDEX IF EXISTS idx_messages_chat_time")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat_epoch ON messages (account, chat_name, epoch)")
     
     # Account Status table
     c.execute('''CREATE TABLE IF NOT EXISTS account_status
@@ -75,10 +96,25 @@ def init_db():
     conn.commit()
     conn.close()
 
+def store_messages(conn, account, messages):
+    """Insert Message records, ignoring ones already stored; returns the ones inserted."""
+    inserted = []
+    for m in messages:
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO messages (account, chat_name, sender, text, timestamp, epoch) VALUES (?, ?, ?, ?, ?, ?)",
+            (account, m.chat, m.sender, m.text, m.stored_timestamp, m.timestamp)
+        )
+        if cursor.rowcount:
+            inserted.append(m)
+    return inserted
+
 # Load config on startup
 load_config()
 init_db()
 
+# Recent messages per chat, kept current on ingest
+conversation_context = ConversationContext(DB_FILE)
+
 # Initialize Gemini if key exists
 model = None
 if config.get("gemini_api_key"):
@@ -98,33 +134,37 @@ def connect():
 
 @app.route('/api/start_connection', methods=['POST'])
 def start_connection():
-    global whatsapp_client
-    with client_lock:
-        if whatsapp_client:
-            whatsapp_client.close()
-        
-        # Sessions will be stored in a local folder
-        session_dir = os.path.abspath("whatsapp_sessions")
-        os.makedirs(session_dir, exist_ok=True)
-        whatsapp_client = WhatsAppWebClient(user_data_dir=session_dir)
-        
-        try:
-            status, data = whatsapp_client.get_qr_code_or_login()
-            return jsonify({"status": status, "qr_code": data})
-        except Exception as e:
-            logging.error(f"Failed to start connection: {e}")
-            return jsonify({"error": str(e)}), 500
+    """Start (or restart) a background login for an account; returns immediately."""
+    account = (request.get_json(silent=True) or {}).get('account') or DEFAULT_ACCOUNT
+    job = login_manager.start(account)
+    return jsonify(job.snapshot()), 202
 
 @app.route('/api/check_login', methods=['GET'])
 def check_login():
-    if not whatsapp_client:
-        return jsonify({"status": "not_started"})
-    
-    try:
-        is_logged_in = whatsapp_client.is_logged_in()
-        return jsonify({"status": "logged_in" if is_logged_in else "qr_pending"})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return jsonify(login_manager.snapshot(request.args.get('account', DEFAULT_ACCOUNT)))
+
+@app.route('/api/login_events', methods=['GET'])
+def login_events():
+    """Server-Sent Events stream of login state (including rotated QR codes)."""
+    account = request.args.get('account', DEFAULT_ACCOUNT)
+
+    def stream():
+        version = login_manager.version
+        last = None
+        while True:
+            snapshot = login_manager.snapshot(account)
+            if snapshot != last:
+                yield f"data: {json.dumps(snapshot)}\n\n"
+                last = snapshot
+            if snapshot["status"] in FINAL_STATES:
+                return
+            # Wake on any state change, with a keep-alive comment every 15s
+            new_version = login_manager.wait_for_change(version, timeout=15)
+            if new_version == version:
+                yield ": keep-alive\n\n"
+            version = new_version
+
+    return Response(stream(), mimetype='text/event-stream', headers={"Cache-Control": "no-cache"})
 
 @app.route('/settings')
 def settings():
@@ -145,20 +185,16 @@ def webhook():
     data = request.json
     if data:
         logging.info(f"Received message via webhook: {data}")
-        # data format expected: {sender:..., text:..., timestamp:..., account:..., chat_name:...}
-        # Fallbacks for legacy format
+        # data format expected: Message.to_dict() fields plus account
+        # (legacy {sender, text, timestamp, chat_name} payloads still parse)
         account = data.get('account', 'Unknown')
-        chat_name = data.get('chat_name', 'Unknown')
-        sender = data.get('sender', 'Unknown')
-        text = data.get('text', '')
-        timestamp = data.get('timestamp', datetime.now().isoformat())
+        message = Message.from_dict(data)
 
         conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
         try:
-            c.execute("INSERT OR IGNORE INTO messages (account, chat_name, sender, text, timestamp) VALUES (?, ?, ?, ?, ?)",
-                      (account, chat_name, sender, text, timestamp))
+            inserted = store_messages(conn, account, [message])
             conn.commit()
+            conversation_context.record(account, inserted)
         except Exception as e:
             logging.error(f"DB Error: {e}")
         finally:
@@ -171,35 +207,24 @@ def upload_history():
     """Endpoint to receive bulk history from Home Assistant."""
     data = request.json
     account = data.get('account')
-    history = data.get('history', {}) # {chat_name: [messages]}
+    history = data.get('history', {}) # {chat_name: [message dicts or legacy strings]}
     
     if not account:
         return jsonify({"error": "Account name required"}), 400
 
     conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    count = 0
+    records = []
     try:
         for chat_name, messages in history.items():
-            for msg in messages:
-                # msg string format: "[timestamp] Sender: Text"
-                # We need to parse it simply
-                timestamp = "Unknown"
-                sender = "Unknown"
-                text = msg
-                
-                # Simple parsing (matches logic in HA integration)
-                import re
-                match = re.match(r"\[(.*?)\]\s(.*?):\s(.*)", msg)
-                if match:
-                    timestamp = match.group(1)
-                    sender = match.group(2)
-                    text = match.group(3)
-                
-                c.execute("INSERT OR IGNORE INTO messages (account, chat_name, sender, text, timestamp) VALUES (?, ?, ?, ?, ?)",
-                          (account, chat_name, sender, text, timestamp))
-                count += 1
+            # Legacy gateways send "[timestamp] Sender: Text" strings
+            records.extend(
+                Message.from_line(chat_name, msg) if isinstance(msg, str) else Message.from_dict(msg, chat=chat_name)
+                for msg in messages
+            )
+        inserted = store_messages(conn, account, records)
         conn.commit()
+        conversation_context.record(account, inserted)
+        count = len(records)
         logging.info(f"Uploaded {count} historical messages for {account}")
     except Exception as e:
         logging.error(f"DB Error during history upload: {e}")
@@ -263,56 +288,64 @@ def get_messages():
     messages = [dict(row) for row in rows]
     return jsonify(messages)
 
-@app.route('/api/generate_suggestions', methods=['POST'])
-def generate_suggestions():
+# Shared by the Flask routes below and the async handlers in asgi.py
+SUGGESTIONS_NOT_CONFIGURED = ["Error: Gemini API Key not configured. Please go to Settings."]
+SUGGESTIONS_FAILED = ["Error generating suggestions."]
+
+class GatewayError(Exception):
+    """A request the gateway can't serve; `status` is the HTTP status to answer with."""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def suggestion_prompt(data):
     """
-    Generates reply suggestions using Gemini.
+    Gemini prompt for a generate_suggestions body. Context is read from the
+    local store for {account, chat_name}; a posted `conversation` list is
+    still accepted from older clients. May query the DB on a cold chat.
     """
-    conversation = request.json.get('conversation', [])
-    logging.info(f"Generating suggestions for conversation...")
-    
-    if not model:
-        return jsonify(["Error: Gemini API Key not configured. Please go to Settings."])
+    account = data.get('account')
+    chat_name = data.get('chat_name')
+    logging.info(f"Generating suggestions for {chat_name or 'posted conversation'}...")
+
+    max_messages = int(config.get("suggestion_context_messages", DEFAULT_MAX_MESSAGES))
+    if account and chat_name:
+        history = conversation_context.window(
+            account, chat_name, max_messages,
+            int(config.get("suggestion_token_budget", DEFAULT_TOKEN_BUDGET)))
+    else:
+        history = [(msg.get('sender', 'Unknown'), msg.get('text', ''))
+                   for msg in data.get('conversation', [])[-max_messages:]]
 
     # Construct prompt
     prompt = "You are an assistant helping me reply to WhatsApp messages. Here is the conversation history:\n\n"
-    for msg in conversation[-10:]: # Use last 10 messages for context
-        sender = msg.get('sender', 'Unknown')
-        text = msg.get('text', '')
-        prompt += f"{sender}: {text}\n"
+    prompt += "".join(f"{sender}: {text}\n" for sender, text in history)
     
     prompt += "\nBased on the above, generate 3 distinct, casual, and relevant short replies that I could send next. Mimic the style of the user if possible. Return ONLY the 3 replies, separated by a pipe character (|)."
-
-    try:
-        response = model.generate_content(prompt)
-        text_response = response.text.strip()
-        suggestions = [s.strip() for s in text_response.split('|')]
-        # Fallback if splitting fails
-        if len(suggestions) < 2:
-             suggestions = text_response.split('\n')
-        
-        return jsonify(suggestions[:3])
-    except Exception as e:
-        logging.error(f"Gemini API Error: {e}")
-        return jsonify(["Error generating suggestions."])
-
-
-@app.route('/api/send_message', methods=['POST'])
-def send_message():
-    """Endpoint for the frontend to send a message via Home Assistant."""
-    data = request.json
+    return prompt
+
+def parse_suggestions(text_response):
+    text_response = text_response.strip()
+    suggestions = [s.strip() for s in text_response.split('|')]
+    # Fallback if splitting fails
+    if len(suggestions) < 2:
+         suggestions = text_response.split('\n')
+    return suggestions[:3]
+
+def ha_send_message_request(data):
+    """(url, headers, payload) for HA's send_message service; raises GatewayError."""
     sender = data.get('sender')
     contact = data.get('contact')
     message = data.get('message')
 
     if not sender or not contact or not message:
-        return jsonify({"error": "Sender, contact, and message are required"}), 400
+        raise GatewayError("Sender, contact, and message are required", 400)
     
     ha_url = config.get("ha_url")
     ha_token = config.get("ha_token")
 
     if not ha_url or not ha_token:
-        return jsonify({"error": "Home Assistant URL and Token not configured. Please go to Settings."}), 500
+        raise GatewayError("Home Assistant URL and Token not configured. Please go to Settings.", 500)
 
     service_url = f"{ha_url}/api/services/whatsapp_hass/send_message"
     headers = {
@@ -324,11 +357,36 @@ def send_message():
         "contact": contact,
         "message": message,
     }
+    return service_url, headers, payload
+
+@app.route('/api/generate_suggestions', methods=['POST'])
+def generate_suggestions():
+    """Generates reply suggestions using Gemini."""
+    if not model:
+        return jsonify(SUGGESTIONS_NOT_CONFIGURED)
+    prompt = suggestion_prompt(request.json or {})
+
+    try:
+        response = model.generate_content(prompt)
+        return jsonify(parse_suggestions(response.text))
+    except Exception as e:
+        logging.error(f"Gemini API Error: {e}")
+        return jsonify(SUGGESTIONS_FAILED)
+
+
+@app.route('/api/send_message', methods=['POST'])
+def send_message():
+    """Endpoint for the frontend to send a message via Home Assistant."""
+    data = request.json
+    try:
+        service_url, headers, payload = ha_send_message_request(data)
+    except GatewayError as e:
+        return jsonify({"error": str(e)}), e.status
 
     try:
         response = requests.post(service_url, headers=headers, json=payload)
         response.raise_for_status()
-        logging.info(f"Successfully called send_message service for contact: {contact} from {sender}")
+        logging.info(f"Successfully called send_message service for contact: {payload['contact']} from {payload['sender']}")
         return jsonify({"success": True, "ha_response": response.json()})
     except requests.exceptions.RequestException as e:
         logging.error(f"Error calling Home Assistant service: {e}")
@@ -341,42 +399,45 @@ def proxy_send_message():
     contact = data.get('contact')
     message = data.get('message')
 
-    if not whatsapp_client:
-        return jsonify({"error": "WhatsApp client not running on gateway"}), 500
+    with login_manager.browser(data.get('account')) as whatsapp_client:
+        if not whatsapp_client:
+            return jsonify({"error": "WhatsApp client not running on gateway"}), 500
 
-    try:
-        whatsapp_client.send_message(contact, message)
-        return jsonify({"success": True})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        try:
+            whatsapp_client.send_message(contact, message)
+            return jsonify({"success": True})
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
 
 def monitoring_thread():
     """Background task to poll WhatsApp and push to HA."""
     logging.info("Starting monitoring thread...")
-    logged_messages = set()
+    logged_ids = set()
     while True:
-        if whatsapp_client and whatsapp_client.is_logged_in():
-            try:
-                # For this prototype, we monitor "Me" or recent chats
-                # In a full version, this would be more dynamic
-                chats = ["Me"] 
-                for chat in chats:
-                    messages = whatsapp_client.get_latest_messages(chat)
-                    for msg in messages:
-                        if msg not in logged_messages:
-                            logging.info(f"New message from {chat}: {msg}")
-                            # Push to HA if configured
-                            ha_url = config.get("ha_url")
-                            if ha_url:
-                                try:
-                                    # Simple webhook push to HA (if HA supports it)
-                                    # Or we just store it locally and HA polls
-                                    pass 
-                                except:
-                                    pass
-                            logged_messages.add(msg)
-            except Exception as e:
-                logging.error(f"Error in monitoring: {e}")
+        # Holds the browser per pass, so sends for this account wait rather than collide
+        with login_manager.browser() as whatsapp_client:
+            if whatsapp_client and whatsapp_client.is_logged_in():
+                try:
+                    # For this prototype, we monitor "Me" or recent chats
+                    # In a full version, this would be more dynamic
+                    chats = ["Me"] 
+                    for chat in chats:
+                        messages = whatsapp_client.get_latest_messages(chat)
+                        for msg in messages:
+                            if msg.id not in logged_ids:
+                                logging.info(f"New message from {chat}: {msg.sender}: {msg.text}")
+                                # Push to HA if configured
+                                ha_url = config.get("ha_url")
+                                if ha_url:
+                                    try:
+                                        # Simple webhook push to HA (if HA supports it)
+                                        # Or we just store it locally and HA polls
+                                        pass 
+                                    except:
+                                        pass
+                                logged_ids.add(msg.id)
+                except Exception as e:
+                    logging.error(f"Error in monitoring: {e}")
         time.sleep(15)
 
 # Start background monitor
@@ -0,0 +1,282 @@
+"""
+Async (ASGI) serving mode for the gateway.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5001
+
+The Flask routes in app.py are reused for everything that touches Selenium
+or SQLite: each request runs the WSGI app on a bounded thread pool chosen by
+route, so a slow browser can only tie up its own pool. The remote calls are
+served natively instead: the Home Assistant service call goes out over a
+shared httpx.AsyncClient and Gemini is awaited via generate_content_async,
+so any number of them can be in flight without holding a thread. Login
+events (SSE) are streamed natively too.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+import asyncio
+import io
+import json
+import logging
+import sys
+
+import httpx
+
+import app as gateway
+from login_manager import DEFAULT_ACCOUNT, FINAL_STATES
+
+# Each account's driver is serialized by LoginManager.browser(); this pool only
+# bounds how many accounts send at once, so one slow send doesn't block the others
+POOLS = {
+    "browser": ThreadPoolExecutor(max_workers=4, thread_name_prefix="browser"),
+    "db": ThreadPoolExecutor(max_workers=4, thread_name_prefix="db"),
+}
+ROUTE_POOLS = {
+    "/api/proxy_send_message": "browser",
+}
+DEFAULT_POOL = "db"
+
+MAX_BODY_SIZE = 16 * 1024 * 1024
+SSE_KEEPALIVE = 15
+HA_TIMEOUT = httpx.Timeout(30, connect=5)
+# httpx logs every request at INFO, which the gateway's root logger would print
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Created at lifespan startup; keeps connections to Home Assistant alive
+_http = None
+
+
+def _wsgi_environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name, value = name.decode("latin1"), value.decode("latin1")
+        if name == "content-type":
+            environ["CONTENT_TYPE"] = value
+        elif name == "content-length":
+            environ["CONTENT_LENGTH"] = value
+        else:
+            key = "HTTP_" + name.upper().replace("-", "_")
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _run_wsgi(environ):
+    """Call the Flask app to completion (runs on a pool thread)."""
+    captured = {}
+
+    def start_response(status, headers, exc_info=None):
+        captured["status"] = int(status.split(" ", 1)[0])
+        captured["headers"] = headers
+
+    result = gateway.app.wsgi_app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return captured["status"], captured["headers"], body
+
+
+async def _read_body(receive):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        size += len(chunks[-1])
+        if size > MAX_BODY_SIZE:
+            raise ValueError("Request body too large")
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _send_simple(send, status, body, content_type=b"text/plain"):
+    await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", content_type)]})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send, data, status=200):
+    await _send_simple(send, status, json.dumps(data).encode(), b"application/json")
+
+
+async def _read_json(receive, send):
+    """Request body as a dict, or None once an error response has been sent."""
+    try:
+        body = await _read_body(receive)
+    except ValueError as e:
+        await _send_simple(send, 413, str(e).encode())
+        return None
+    if body is None:
+        return None
+    try:
+        data = json.loads(body or b"{}")
+    except ValueError:
+        await _send_json(send, {"error": "Invalid JSON body"}, 400)
+        return None
+    return data if isinstance(data, dict) else {}
+
+
+async def _handle_send_message(scope, receive, send):
+    """Native version of /api/send_message: the HA call is awaited, not run on a thread."""
+    data = await _read_json(receive, send)
+    if data is None:
+        return
+    try:
+        service_url, headers, payload = gateway.ha_send_message_request(data)
+    except gateway.GatewayError as e:
+        await _send_json(send, {"error": str(e)}, e.status)
+        return
+
+    try:
+        response = await _http.post(service_url, headers=headers, json=payload, timeout=HA_TIMEOUT)
+        response.raise_for_status()
+        ha_response = response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        logging.error(f"Error calling Home Assistant service: {e}")
+        await _send_json(send, {"error": str(e)}, 500)
+        return
+    logging.info(f"Successfully called send_message service for contact: {payload['contact']} from {payload['sender']}")
+    await _send_json(send, {"success": True, "ha_response": ha_response})
+
+
+async def _handle_generate_suggestions(scope, receive, send):
+    """Native version of /api/generate_suggestions: Gemini is awaited, not run on a thread."""
+    data = await _read_json(receive, send)
+    if data is None:
+        return
+    model = gateway.model
+    if not model:
+        await _send_json(send, gateway.SUGGESTIONS_NOT_CONFIGURED)
+        return
+    # The context window may be loaded from SQLite on a cold chat
+    loop = asyncio.get_running_loop()
+    prompt = await loop.run_in_executor(POOLS["db"], gateway.suggestion_prompt, data)
+
+    try:
+        response = await model.generate_content_async(prompt)
+        suggestions = gateway.parse_suggestions(response.text)
+    except Exception as e:
+        logging.error(f"Gemini API Error: {e}")
+        suggestions = gateway.SUGGESTIONS_FAILED
+    await _send_json(send, suggestions)
+
+
+async def _handle_wsgi(scope, receive, send):
+    try:
+        body = await _read_body(receive)
+    except ValueError as e:
+        await _send_simple(send, 413, str(e).encode())
+        return
+    if body is None:
+        return
+
+    pool = POOLS[ROUTE_POOLS.get(scope["path"], DEFAULT_POOL)]
+    loop = asyncio.get_running_loop()
+    status, headers, payload = await loop.run_in_executor(pool, _run_wsgi, _wsgi_environ(scope, body))
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(k.lower().encode("latin1"), v.encode("latin1")) for k, v in headers],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def _handle_login_events(scope, receive, send):
+    """Native SSE version of /api/login_events: waits on an asyncio.Event, not a thread."""
+    account = parse_qs(scope["query_string"].decode("latin1")).get("account", [DEFAULT_ACCOUNT])[0]
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+    remove_listener = gateway.login_manager.add_listener(lambda: loop.call_soon_threadsafe(changed.set))
+
+    async def watch_disconnect():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        changed.set()
+
+    watcher = asyncio.create_task(watch_disconnect())
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")],
+    })
+    try:
+        last = None
+        while not watcher.done():
+            changed.clear()
+            snapshot = gateway.login_manager.snapshot(account)
+            if snapshot != last:
+                await send({"type": "http.response.body", "body": f"data: {json.dumps(snapshot)}\n\n".encode(), "more_body": True})
+                last = snapshot
+            if snapshot["status"] in FINAL_STATES:
+                break
+            try:
+                await asyncio.wait_for(changed.wait(), SSE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                await send({"type": "http.response.body", "body": b": keep-alive\n\n", "more_body": True})
+        if not watcher.done():
+            await send({"type": "http.response.body", "body": b""})
+    except OSError:
+        pass  # client went away mid-write
+    finally:
+        remove_listener()
+        watcher.cancel()
+
+
+async def _handle_lifespan(receive, send):
+    global _http
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            _http = httpx.AsyncClient()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            for pool in POOLS.values():
+                pool.shutdown(wait=False, cancel_futures=True)
+            await _http.aclose()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+NATIVE_ROUTES = {
+    ("POST", "/api/send_message"): _handle_send_message,
+    ("POST", "/api/generate_suggestions"): _handle_generate_suggestions,
+}
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _handle_lifespan(receive, send)
+    elif scope["type"] != "http":
+        return
+    elif scope["path"] == "/api/login_events":
+        await _handle_login_events(scope, receive, send)
+    else:
+        handler = NATIVE_ROUTES.get((scope["method"], scope["path"]), _handle_wsgi)
+        try:
+            await handler(scope, receive, send)
+        except Exception as e:
+            logging.error(f"Unhandled error serving {scope['path']}: {e}")
+            await _send_simple(send, 500, b"Internal Server Error")
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(application, host='0.0.0.0', port=5001)
@@ -0,0 +1,76 @@
+"""
+Headless send/scrape throughput benchmark against the offline fixture server.
+
+    python benchmark.py --sends 20 --chats 200
+
+Starts fixture_server.py on a local port, drives WhatsAppWebClient against it
+and prints messages/second for sending and for scrape_all_data().
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.request
+
+import fixture_server
+from whatsapp_web_client import WhatsAppWebClient
+
+
+def _control(base_url, path, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(f"{base_url}{path}", data=data, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=5) as resp:
+        return json.load(resp)
+
+
+def _wait_for_server(base_url, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            return _control(base_url, "/fixture/state")
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Fixture server did not come up at {base_url}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--chats', type=int, default=50)
+    parser.add_argument('--sends', type=int, default=10)
+    parser.add_argument('--traffic-rate', type=float, default=0,
+                        help="Inbound messages/second generated while benchmarking")
+    args = parser.parse_args()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    threading.Thread(target=fixture_server.run, kwargs={"port": args.port}, daemon=True).start()
+    _wait_for_server(base_url)
+    _control(base_url, "/fixture/reset", {"chats": args.chats, "logged_in": True})
+
+    client = WhatsAppWebClient(base_url=base_url)
+    try:
+        start = time.perf_counter()
+        status, _ = client.get_qr_code_or_login()
+        print(f"login: {status} in {time.perf_counter() - start:.2f}s")
+
+        if args.traffic_rate:
+            _control(base_url, "/fixture/traffic", {"rate": args.traffic_rate, "duration": 3600})
+
+        start = time.perf_counter()
+        for i in range(args.sends):
+            client.send_message(f"Chat {i % args.chats:04d}", f"benchmark message {i}")
+        elapsed = time.perf_counter() - start
+        sent = _control(base_url, "/fixture/stats")["sent"]
+        print(f"send: {sent}/{args.sends} delivered in {elapsed:.2f}s ({args.sends / elapsed:.2f} msg/s)")
+
+        start = time.perf_counter()
+        data = client.scrape_all_data()
+        elapsed = time.perf_counter() - start
+        scraped = sum(len(m) for m in data.values())
+        print(f"scrape: {scraped} messages from {len(data)} chats in {elapsed:.2f}s ({scraped / elapsed:.2f} msg/s)")
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Recent-message windows per chat, used as context for AI reply suggestions.
+
+Each (account, chat) keeps a small buffer of its latest messages, ordered
+by message time: the numeric `epoch` column, where timestamps that couldn't
+be parsed are 0 and so count as the oldest messages. A buffer is
+filled from the messages table the first time the chat is asked for (one
+indexed query), then kept current as messages are ingested, so building a
+prompt never re-reads or re-sends the whole history.
+"""
+from collections import OrderedDict
+import bisect
+import sqlite3
+import threading
+
+# Messages kept per chat; the prompt window is taken from these
+BUFFER_SIZE = 50
+# Chats kept in memory; least recently used ones are reloaded from the DB on demand
+MAX_CHATS = 500
+
+DEFAULT_MAX_MESSAGES = 20
+DEFAULT_TOKEN_BUDGET = 1500
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token); good enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+class ConversationContext:
+    """LRU of per-chat buffers of (epoch, sender, text) tuples, oldest first."""
+
+    def __init__(self, db_file, buffer_size=BUFFER_SIZE, max_chats=MAX_CHATS):
+        self._db_file = db_file
+        self._buffer_size = buffer_size
+        self._max_chats = max_chats
+        self._buffers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, account, messages):
+        """Add Message records to chats already in memory, in timestamp order.
+
+        Pass only rows that were actually inserted, after the commit; chats
+        not loaded yet pick the messages up from the DB when first asked for.
+        """
+        with self._lock:
+            for m in messages:
+                buffer = self._buffers.get((account, m.chat))
+                if buffer is None:
+                    continue
+                entry = (m.timestamp, m.sender, m.text)
+                if len(buffer) >= self._buffer_size and entry[0] < buffer[0][0]:
+                    # Older than everything kept; the DB may hold newer rows in between
+                    continue
+                # The buffer may have been loaded after the commit and already hold it
+                if entry in buffer:
+                    continue
+                bisect.insort(buffer, entry, key=lambda e: e[0])
+                del buffer[:-self._buffer_size]
+
+    def window(self, account, chat, max_messages=DEFAULT_MAX_MESSAGES, token_budget=DEFAULT_TOKEN_BUDGET):
+        """Latest messages of a chat, oldest first, within both limits.
+
+        Returns a list of (sender, text). The newest message is always
+        included, even if it alone exceeds the budget.
+        """
+        with self._lock:
+            buffer = self._buffer(account, chat)
+            entries = list(buffer)
+
+        selected = []
+        used = 0
+        for _, sender, text in reversed(entries):
+            if len(selected) >= max_messages:
+                break
+            sender, text = sender or "Unknown", text or ""
+            cost = estimate_tokens(f"{sender}: {text}")
+            if selected and used + cost > token_budget:
+                break
+            used += cost
+            selected.append((sender, text))
+        selected.reverse()
+        return selected
+
+    def _buffer(self, account, chat):
+        key = (account, chat)
+        buffer = self._buffers.get(key)
+        if buffer is not None:
+            self._buffers.move_to_end(key)
+            return buffer
+
+        # Loaded under the lock so a concurrent record() can't slip in between
+        conn = sqlite3.connect(self._db_file)
+        try:
+            rows = conn.execute(
+                "SELECT COALESCE(epoch, 0), sender, text FROM messages WHERE account = ? AND chat_name = ? "
+                "ORDER BY epoch DESC, id DESC LIMIT ?",
+                (account, chat, self._buffer_size),
+            ).fetchall()
+        finally:
+            conn.close()
+
+        buffer = self._buffers[key] = rows[::-1]
+        while len(self._buffers) > self._max_chats:
+            self._buffers.popitem(last=False)
+        return buffer
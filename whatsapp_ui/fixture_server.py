@@ -0,0 +1,373 @@
+"""
+Offline WhatsApp Web fixture server.
+
+Serves a small page that mimics the parts of the WhatsApp Web DOM the
+Selenium client touches (``#side``, the ``data-tab="3"`` search box and
+``data-tab="10"`` composer, ``.message-in/.message-out`` bubbles with
+``.copyable-text[data-pre-plain-text]``, the QR ``canvas`` and a virtualized
+chat list), plus a JSON control API to script login state and message traffic.
+
+Run it and point the client at it:
+
+    python fixture_server.py --port 8089 --chats 200
+    WHATSAPP_WEB_URL=http://127.0.0.1:8089 python app.py
+"""
+from flask import Flask, render_template_string, request, jsonify
+from datetime import datetime
+import argparse
+import logging
+import random
+import threading
+import time
+
+app = Flask(__name__)
+
+# --- Fixture State ---
+TIME_FORMATS = {
+    # data-pre-plain-text layouts as rendered by WhatsApp Web per locale
+    "eu": "[%H:%M, %d/%m/%Y] ",
+    "us": "[%I:%M %p, %m/%d/%Y] ",
+    "iso": "[%H:%M, %Y-%m-%d] ",
+}
+
+SAMPLE_TEXTS = [
+    "Hey, are you around?",
+    "On my way",
+    "Did you see the match yesterday?",
+    "Can you pick up milk?",
+    "Sounds good 👍",
+    "Meeting moved to 3pm",
+    "Happy birthday! 🎉",
+    "Call me when you can",
+]
+
+state_lock = threading.Lock()
+state = {}
+
+
+def reset_state(chat_count=50, logged_in=True, locale="eu", auto_login_after=None, seed=0):
+    """(Re)build the fake account: chats, message history and login state."""
+    rng = random.Random(seed)
+    chats = {}
+    now = time.time()
+    for i in range(chat_count):
+        name = f"Chat {i:04d}"
+        chats[name] = [
+            _make_message(name, rng.choice(SAMPLE_TEXTS), "in", name, now - (chat_count - i) * 60)
+        ]
+    with state_lock:
+        state.clear()
+        state.update({
+            "chats": chats,
+            "order": list(reversed(list(chats))),  # most recent first, like the real sidebar
+            "logged_in": logged_in,
+            "locale": locale,
+            "auto_login_after": auto_login_after,
+            "first_seen": None,
+            "qr_seed": 0,
+            "sent": 0,
+            "received": 0,
+            "seq": 0,
+        })
+
+
+def _make_message(chat, text, direction, sender, ts=None):
+    return {"chat": chat, "text": text, "direction": direction, "sender": sender, "ts": ts or time.time()}
+
+
+def _pre_plain_text(msg):
+    fmt = TIME_FORMATS.get(state.get("locale"), TIME_FORMATS["eu"])
+    return datetime.fromtimestamp(msg["ts"]).strftime(fmt) + f"{msg['sender']}: "
+
+
+def add_message(chat, text, direction="in", sender=None):
+    """Append a message to a chat and bump the chat to the top of the list."""
+    with state_lock:
+        msgs = state["chats"].setdefault(chat, [])
+        msgs.append(_make_message(chat, text, direction, sender or ("You" if direction == "out" else chat)))
+        del msgs[:-200]  # keep the fixture bounded under long traffic runs
+        if chat in state["order"]:
+            state["order"].remove(chat)
+        state["order"].insert(0, chat)
+        state["sent" if direction == "out" else "received"] += 1
+        state["seq"] += 1
+
+
+def generate_traffic(rate, duration, chats=None, seed=None):
+    """Push inbound messages at `rate` per second for `duration` seconds."""
+    rng = random.Random(seed)
+    with state_lock:
+        targets = chats or list(state["chats"])
+    interval = 1.0 / rate if rate > 0 else 0
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        add_message(rng.choice(targets), rng.choice(SAMPLE_TEXTS))
+        if interval:
+            time.sleep(interval)
+
+
+def _is_logged_in():
+    with state_lock:
+        if not state["logged_in"] and state["auto_login_after"] is not None:
+            if state["first_seen"] is None:
+                state["first_seen"] = time.time()
+            elif time.time() - state["first_seen"] >= state["auto_login_after"]:
+                state["logged_in"] = True
+        return state["logged_in"]
+
+
+# --- WhatsApp Web Mimic ---
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<title>WhatsApp</title>
+<style>
+    body { font-family: sans-serif; margin: 0; display: flex; height: 100vh; }
+    #side { width: 320px; border-right: 1px solid #ddd; display: flex; flex-direction: column; }
+    #pane-side { flex: 1; overflow-y: auto; position: relative; }
+    #main { flex: 1; display: flex; flex-direction: column; }
+    #messages { flex: 1; overflow-y: auto; padding: 8px; }
+    div[contenteditable] { border: 1px solid #ccc; padding: 6px; min-height: 18px; }
+    div[role="listitem"] { position: absolute; left: 0; right: 0; height: 48px; border-bottom: 1px solid #eee; cursor: pointer; }
+    .message-in, .message-out { margin: 4px 0; }
+    .message-out { text-align: right; }
+</style>
+</head>
+<body>
+<div id="app"></div>
+<script>
+const ROW_HEIGHT = 48;
+let loggedIn = null, currentChat = null, lastSeq = -1, chatCount = 0, query = '';
+
+async function api(path, opts) {
+    const res = await fetch(path, opts);
+    return res.json();
+}
+
+function renderQr(seed) {
+    document.getElementById('app').innerHTML = '<div id="landing"><canvas width="264" height="264"></canvas></div>';
+    const ctx = document.querySelector('canvas').getContext('2d');
+    let x = seed * 9301 + 49297;
+    for (let i = 0; i < 33; i++) for (let j = 0; j < 33; j++) {
+        x = (x * 9301 + 49297) % 233280;
+        ctx.fillStyle = x / 233280 > 0.5 ? '#000' : '#fff';
+        ctx.fillRect(i * 8, j * 8, 8, 8);
+    }
+}
+
+function renderShell() {
+    document.getElementById('app').innerHTML = `
+        <div id="side">
+            <div contenteditable="true" data-tab="3" role="textbox"></div>
+            <div id="pane-side"><div id="spacer"></div></div>
+        </div>
+        <div id="main">
+            <header><span id="chat-title" title=""></span></header>
+            <div id="messages"></div>
+            <footer><div contenteditable="true" data-tab="10" role="textbox"></div></footer>
+        </div>`;
+    const search = document.querySelector('[data-tab="3"]');
+    search.addEventListener('input', () => { query = search.innerText.trim(); renderList(); });
+    document.getElementById('pane-side').addEventListener('scroll', renderList);
+    const composer = document.querySelector('[data-tab="10"]');
+    composer.addEventListener('keydown', async (e) => {
+        if (e.key !== 'Enter') return;
+        e.preventDefault();
+        const text = composer.innerText.trim();
+        composer.innerText = '';
+        if (!text || !currentChat) return;
+        await api(`/fixture/chats/${encodeURIComponent(currentChat)}/messages`, {
+            method: 'POST', headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({text: text, direction: 'out'})
+        });
+        renderMessages();
+    });
+    renderList();
+}
+
+// Virtualized like the real sidebar: only rows inside the viewport exist in the DOM.
+async function renderList() {
+    const pane = document.getElementById('pane-side');
+    const first = Math.floor(pane.scrollTop / ROW_HEIGHT);
+    const visible = Math.ceil(pane.clientHeight / ROW_HEIGHT) + 1;
+    const page = await api(`/fixture/chats?offset=${first}&limit=${visible}&q=${encodeURIComponent(query)}`);
+    chatCount = page.total;
+    document.getElementById('spacer').style.height = (page.total * ROW_HEIGHT) + 'px';
+    pane.querySelectorAll('[role="listitem"]').forEach(el => el.remove());
+    page.chats.forEach((chat, i) => {
+        const row = document.createElement('div');
+        row.setAttribute('role', 'listitem');
+        row.style.top = ((first + i) * ROW_HEIGHT) + 'px';
+        row.innerHTML = `<span title="${chat.name}">${chat.name}</span><div>${chat.last}</div>`;
+        row.onclick = () => openChat(chat.name);
+        pane.appendChild(row);
+    });
+}
+
+function openChat(name) {
+    currentChat = name;
+    const title = document.getElementById('chat-title');
+    title.setAttribute('title', name);
+    title.innerText = name;
+    const search = document.querySelector('[data-tab="3"]');
+    if (query) { search.innerText = ''; query = ''; renderList(); }
+    renderMessages();
+}
+
+async function renderMessages() {
+    if (!currentChat) return;
+    const msgs = await api(`/fixture/chats/${encodeURIComponent(currentChat)}/messages`);
+    const box = document.getElementById('messages');
+    box.innerHTML = '';
+    msgs.forEach(m => {
+        const row = document.createElement('div');
+        row.className = m.direction === 'out' ? 'message-out' : 'message-in';
+        const body = document.createElement('div');
+        body.className = 'copyable-text';
+        body.setAttribute('data-pre-plain-text', m.pre_plain_text);
+        const span = document.createElement('span');
+        span.className = 'selectable-text';
+        span.innerText = m.text;
+        body.appendChild(span);
+        row.appendChild(body);
+        box.appendChild(row);
+    });
+}
+
+async function tick() {
+    const s = await api('/fixture/state');
+    if (!s.logged_in) {
+        if (loggedIn !== false || s.qr_seed !== window.qrSeed) { window.qrSeed = s.qr_seed; renderQr(s.qr_seed); }
+    } else if (loggedIn !== true) {
+        renderShell();
+    } else if (s.seq !== lastSeq) {
+        // Traffic reorders chats and changes previews, not just the count
+        renderList();
+        renderMessages();
+    }
+    loggedIn = s.logged_in;
+    lastSeq = s.seq;
+}
+
+tick();
+setInterval(tick, 500);
+</script>
+</body>
+</html>
+"""
+
+
+@app.route('/')
+def index():
+    return render_template_string(PAGE)
+
+
+# --- Control API ---
+
+@app.route('/fixture/state', methods=['GET'])
+def get_state():
+    logged_in = _is_logged_in()
+    with state_lock:
+        # The real page rotates its QR code roughly every 20 seconds
+        return jsonify({
+            "logged_in": logged_in,
+            "qr_seed": int(time.time() // 20),
+            "seq": state["seq"],
+            "chats": len(state["chats"]),
+        })
+
+
+@app.route('/fixture/login', methods=['POST'])
+def set_login():
+    data = request.json or {}
+    with state_lock:
+        state["logged_in"] = bool(data.get("logged_in", True))
+    return jsonify({"success": True})
+
+
+@app.route('/fixture/chats', methods=['GET'])
+def list_chats():
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', 20, type=int)
+    query = request.args.get('q', '').lower()
+    with state_lock:
+        names = [n for n in state["order"] if query in n.lower()] if query else state["order"]
+        page = [
+            {"name": n, "last": state["chats"][n][-1]["text"] if state["chats"][n] else ""}
+            for n in names[offset:offset + limit]
+        ]
+        return jsonify({"total": len(names), "chats": page})
+
+
+@app.route('/fixture/chats/<chat>/messages', methods=['GET', 'POST'])
+def chat_messages(chat):
+    if request.method == 'POST':
+        data = request.json or {}
+        add_message(chat, data.get('text', ''), data.get('direction', 'in'), data.get('sender'))
+        return jsonify({"success": True})
+
+    with state_lock:
+        msgs = state["chats"].get(chat, [])[-50:]
+        return jsonify([
+            {"text": m["text"], "direction": m["direction"], "pre_plain_text": _pre_plain_text(m)}
+            for m in msgs
+        ])
+
+
+@app.route('/fixture/traffic', methods=['POST'])
+def start_traffic():
+    """Start a background generator of inbound messages."""
+    data = request.json or {}
+    rate = float(data.get('rate', 5))
+    duration = float(data.get('duration', 10))
+    threading.Thread(
+        target=generate_traffic,
+        args=(rate, duration, data.get('chats'), data.get('seed')),
+        daemon=True,
+    ).start()
+    logging.info(f"Generating traffic: {rate}/s for {duration}s")
+    return jsonify({"success": True})
+
+
+@app.route('/fixture/stats', methods=['GET'])
+def get_stats():
+    with state_lock:
+        return jsonify({"sent": state["sent"], "received": state["received"], "chats": len(state["chats"])})
+
+
+@app.route('/fixture/reset', methods=['POST'])
+def reset():
+    data = request.json or {}
+    reset_state(
+        chat_count=int(data.get('chats', 50)),
+        logged_in=bool(data.get('logged_in', True)),
+        locale=data.get('locale', 'eu'),
+        auto_login_after=data.get('auto_login_after'),
+        seed=data.get('seed', 0),
+    )
+    return jsonify({"success": True})
+
+
+def run(host='127.0.0.1', port=8089):
+    """Serve the fixture (blocking). Used directly by benchmark.py in a thread."""
+    app.run(host=host, port=port, debug=False, use_reloader=False, threaded=True)
+
+
+reset_state()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offline WhatsApp Web fixture server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--chats', type=int, default=50)
+    parser.add_argument('--locale', choices=sorted(TIME_FORMATS), default='eu')
+    parser.add_argument('--logged-out', action='store_true', help="Start on the QR code screen")
+    parser.add_argument('--auto-login-after', type=float, default=None,
+                        help="Seconds after the first page load before the QR is 'scanned'")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    reset_state(args.chats, not args.logged_out, args.locale, args.auto_login_after)
+    run(args.host, args.port)
@@ -0,0 +1,221 @@
+"""
+Background login jobs for the gateway.
+
+Launching Chrome and waiting for WhatsApp Web to show either the chat list or
+a QR code takes tens of seconds, so it runs on a worker thread per account.
+HTTP handlers only start jobs and read their in-memory state.
+
+A Selenium driver isn't thread-safe, so each job owns a lock that every user
+of its browser (the job itself, sends, the monitor) holds while driving it;
+see `LoginManager.browser`. Different accounts never wait on each other.
+"""
+from contextlib import contextmanager
+import logging
+import os
+import threading
+import time
+
+from whatsapp_web_client import WhatsAppWebClient
+
+LAUNCHING = "launching"
+QR_READY = "qr_ready"
+LOGGED_IN = "logged_in"
+FAILED = "failed"
+STOPPED = "stopped"
+# States after which a login event stream can end
+FINAL_STATES = (LOGGED_IN, FAILED)
+
+DEFAULT_ACCOUNT = "default"
+SESSION_ROOT = os.path.abspath("whatsapp_sessions")
+
+# How often the page is polled for login / a rotated QR code, and how long a
+# QR code may go unscanned before the job gives up.
+POLL_INTERVAL = 1.0
+LOGIN_TIMEOUT = 300
+
+
+def session_dir_for(account):
+    """Chrome profile directory for an account (default keeps the legacy path)."""
+    if account == DEFAULT_ACCOUNT:
+        return SESSION_ROOT
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in account)
+    return f"{SESSION_ROOT}-{safe}"
+
+
+class LoginJob:
+    """Drives one account's browser from launch to logged_in (or failed)."""
+
+    def __init__(self, account, manager, previous=None, base_url=None):
+        self.account = account
+        self.state = LAUNCHING
+        self.qr_code = None
+        self.error = None
+        self.updated_at = time.time()
+        self.client = None
+        # Held by whoever is driving this job's browser
+        self.browser_lock = threading.Lock()
+        self._manager = manager
+        self._previous = previous
+        self._base_url = base_url
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"login-{account}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Ask the job to finish; the worker thread closes the browser."""
+        self._stop.set()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def snapshot(self):
+        return {
+            "account": self.account,
+            "status": self.state,
+            "qr_code": self.qr_code,
+            "error": self.error,
+            "updated_at": self.updated_at,
+        }
+
+    def _set(self, state, qr_code=None, error=None):
+        self.state = state
+        self.qr_code = qr_code
+        self.error = error
+        self.updated_at = time.time()
+        self._manager.notify()
+
+    def _run(self):
+        # The old browser must release the Chrome profile before we reuse it
+        if self._previous:
+            self._previous.stop()
+            self._previous.join()
+            self._previous = None
+
+        try:
+            session_dir = session_dir_for(self.account)
+            os.makedirs(session_dir, exist_ok=True)
+            with self.browser_lock:
+                self.client = WhatsAppWebClient(user_data_dir=session_dir, base_url=self._base_url)
+                self.client.launch()
+
+            deadline = time.time() + LOGIN_TIMEOUT
+            while not self._stop.is_set():
+                with self.browser_lock:
+                    logged_in = self.client.is_logged_in()
+                    qr_code = None if logged_in else self.client.get_qr_code()
+                if logged_in:
+                    self._set(LOGGED_IN)
+                    logging.info(f"Account {self.account} logged in")
+                    break
+
+                if qr_code and qr_code != self.qr_code:
+                    # The page rotates its QR code periodically; keep the latest
+                    self._set(QR_READY, qr_code=qr_code)
+                    deadline = time.time() + LOGIN_TIMEOUT
+
+                if time.time() > deadline:
+                    self._set(FAILED, error="Timed out waiting for QR code scan")
+                    break
+                self._stop.wait(POLL_INTERVAL)
+        except Exception as e:
+            logging.error(f"Login for {self.account} failed: {e}")
+            self._set(FAILED, error=str(e))
+
+        # A logged-in browser stays up until the job is replaced or stopped
+        if self.state == LOGGED_IN:
+            self._stop.wait()
+        self.close_client()
+        if self.state != FAILED:
+            self._set(STOPPED)
+
+    def close_client(self):
+        # Waits for an in-progress send or scrape to finish first
+        with self.browser_lock:
+            if self.client:
+                try:
+                    self.client.close()
+                except Exception as e:
+                    logging.error(f"Failed to close browser for {self.account}: {e}")
+                self.client = None
+
+
+class LoginManager:
+    """Tracks one LoginJob per account and wakes listeners on state changes."""
+
+    def __init__(self, base_url=None):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._version = 0
+        self._listeners = []
+        self._base_url = base_url
+
+    def start(self, account=DEFAULT_ACCOUNT):
+        with self._lock:
+            previous = self._jobs.get(account)
+            job = LoginJob(account, self, previous=previous, base_url=self._base_url)
+            self._jobs[account] = job
+        job.start()
+        self.notify()
+        return job
+
+    def get(self, account=DEFAULT_ACCOUNT):
+        return self._jobs.get(account)
+
+    def snapshot(self, account=DEFAULT_ACCOUNT):
+        """Login state for an account as served to the dashboard."""
+        job = self._jobs.get(account)
+        return job.snapshot() if job else {"account": account, "status": "not_started"}
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _logged_in_job(self, account=None):
+        if account:
+            job = self._jobs.get(account)
+            return job if job and job.state == LOGGED_IN else None
+        for job in self.jobs():
+            if job.state == LOGGED_IN and job.client:
+                return job
+        return None
+
+    @contextmanager
+    def browser(self, account=None):
+        """
+        Hold a logged-in account's browser (the first one if `account` isn't
+        given) for the duration of the block:
+            with login_manager.browser(account) as client: ...
+        `client` is None if the account isn't logged in (or was closed while waiting).
+        """
+        job = self._logged_in_job(account)
+        if job is None:
+            yield None
+            return
+        with job.browser_lock:
+            yield job.client if job.state == LOGGED_IN else None
+
+    def notify(self):
+        with self._changed:
+            self._version += 1
+            self._changed.notify_all()
+        for listener in list(self._listeners):
+            listener()
+
+    def add_listener(self, listener):
+        """Call `listener()` (from any thread) on every state change; returns a remover."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def wait_for_change(self, version, timeout=None):
+        """Block until the state version moves past `version`; returns the new version."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._version != version, timeout)
+            return self._version
+
+    @property
+    def version(self):
+        return self._version
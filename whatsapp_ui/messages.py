@@ -0,0 +1,181 @@
+"""
+Shared message record for the gateway.
+
+Everything that moves messages around (the Selenium scraper, the monitor,
+the webhook and history upload) uses `Message` instead of formatted strings,
+and `parse_pre_plain_text` is the single parser for WhatsApp Web's
+``data-pre-plain-text`` attribute.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+import hashlib
+import re
+import time
+
+DIRECTION_IN = "in"
+DIRECTION_OUT = "out"
+
+# Matches the data-pre-plain-text layouts WhatsApp Web renders per locale, e.g.
+#   "[14:05, 19/10/2026] Alice: "      (en-GB, nl, ...)
+#   "[2:05 PM, 10/19/2026] Alice: "    (en-US)
+#   "[14.05, 19.10.26] Alice: "        (de, fi, ...)
+#   "[14:05, 2026-10-19] Alice: "      (sv, ISO)
+# The sender is everything up to the trailing ": " (names may contain colons).
+_PRE_PLAIN_TEXT = re.compile(
+    r"^\s*\[(\d{1,2})[:.](\d{2})(?:[:.]\d{2})?\s*([AaPp])?\.?\s?(?:[Mm]\.?)?,\s*"
+    r"(\d{1,4})[./-](\d{1,2})[./-](\d{1,4})\]\s*(.*?):?\s*$"
+)
+# Legacy "[meta] Sender: Text" lines produced by older gateways
+_LEGACY_LINE = re.compile(r"^(\[.*?\]\s.*?:\s)(.*)$", re.DOTALL)
+# "[anything] Sender: " when the bracket isn't a known WhatsApp layout
+_BRACKETED_META = re.compile(r"^\s*\[(.*?)\]\s*(.*?):?\s*$", re.DOTALL)
+
+
+@dataclass(slots=True, frozen=True)
+class Message:
+    """
+    A single chat message. `timestamp` is epoch seconds (local time on the page).
+    `raw_timestamp` keeps the original text when it couldn't be parsed.
+    """
+    id: str
+    chat: str
+    sender: str
+    timestamp: float
+    direction: str
+    text: str
+    raw_timestamp: str = None
+
+    @classmethod
+    def create(cls, chat, sender, timestamp, text, direction=DIRECTION_IN):
+        """Build a message with a stable id derived from its content."""
+        return cls(make_id(chat, sender, timestamp, text), chat, sender, timestamp, direction, text)
+
+    @classmethod
+    def from_pre_plain_text(cls, chat, meta, text, direction=DIRECTION_IN, day_first=True):
+        """Build a message from a bubble's data-pre-plain-text attribute and text."""
+        timestamp, sender = parse_pre_plain_text(meta, day_first=day_first)
+        if timestamp:
+            return cls.create(chat, sender, timestamp, text, direction)
+
+        # Unknown layout: keep the bracket text so distinct messages stay distinct
+        raw, sender = split_meta(meta)
+        raw = raw or "Unknown"
+        try:
+            timestamp = datetime.fromisoformat(raw).timestamp()
+        except ValueError:
+            timestamp = 0.0
+        return cls(make_id(chat, sender, raw, text), chat, sender, timestamp, direction, text, raw)
+
+    @classmethod
+    def from_line(cls, chat, line):
+        """Parse a legacy "[meta] Sender: Text" string."""
+        match = _LEGACY_LINE.match(line)
+        if not match:
+            # Stored as the old gateway did, rather than as a 1970 timestamp
+            return cls(make_id(chat, "Unknown", "Unknown", line), chat, "Unknown", 0.0, DIRECTION_IN, line, "Unknown")
+        return cls.from_pre_plain_text(chat, match.group(1), match.group(2))
+
+    @classmethod
+    def from_dict(cls, data, chat=None):
+        """Build a message from a JSON payload (webhook / history upload)."""
+        chat = data.get("chat") or data.get("chat_name") or chat or "Unknown"
+        sender = data.get("sender", "Unknown")
+        text = data.get("text", "")
+        raw = data.get("timestamp")
+        timestamp = parse_timestamp(raw)
+        direction = data.get("direction", DIRECTION_IN)
+        if timestamp is None:
+            # Unreadable text is stored as-is, so a redelivery still dedupes
+            raw = str(raw)
+            message_id = str(data["id"]) if data.get("id") else make_id(chat, sender, raw, text)
+            return cls(message_id, chat, sender, 0.0, direction, text, raw)
+        if data.get("id"):
+            return cls(str(data["id"]), chat, sender, timestamp, direction, text)
+        return cls.create(chat, sender, timestamp, text, direction)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "chat": self.chat,
+            "sender": self.sender,
+            "timestamp": self.timestamp,
+            "direction": self.direction,
+            "text": self.text,
+        }
+
+    @property
+    def isoformat(self):
+        return datetime.fromtimestamp(self.timestamp).isoformat()
+
+    @property
+    def stored_timestamp(self):
+        """Timestamp as stored in the messages table: ISO, or the original text."""
+        return self.raw_timestamp or self.isoformat
+
+
+def make_id(chat, sender, timestamp, text):
+    """Stable short id used to dedupe messages seen more than once."""
+    key = f"{chat}\x1f{sender}\x1f{timestamp}\x1f{text}".encode()
+    return hashlib.blake2b(key, digest_size=8).hexdigest()
+
+
+def parse_pre_plain_text(meta, day_first=True):
+    """
+    Parse a data-pre-plain-text attribute into (epoch_timestamp, sender).
+    Unrecognised layouts yield (0.0, sender) with the sender taken after
+    the brackets; see `split_meta` for the bracket text itself.
+    `day_first` resolves ambiguous numeric dates like 03/04/2026.
+    """
+    match = _PRE_PLAIN_TEXT.match(meta or "")
+    if not match:
+        return 0.0, split_meta(meta)[1]
+
+    hour, minute, meridiem, a, b, c, sender = match.groups()
+    hour, minute, a, b, c = int(hour), int(minute), int(a), int(b), int(c)
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem in "Pp" else 0)
+
+    if a > 31:  # year first (ISO)
+        year, month, day = a, b, c
+    else:
+        year = c
+        # Locale order only matters when both fields could be a month
+        if a > 12 or (day_first and b <= 12):
+            day, month = a, b
+        else:
+            month, day = a, b
+    if year < 100:
+        year += 2000
+
+    try:
+        timestamp = datetime(year, month, day, hour, minute).timestamp()
+    except ValueError:
+        timestamp = 0.0
+    return timestamp, sender.strip() or "Unknown"
+
+
+def split_meta(meta):
+    """Split "[anything] Sender: " into (bracket text, sender) without parsing the date."""
+    match = _BRACKETED_META.match(meta or "")
+    if not match:
+        return "", (meta or "").strip(" :") or "Unknown"
+    return match.group(1).strip(), match.group(2).strip() or "Unknown"
+
+
+def parse_timestamp(value):
+    """
+    Accept epoch seconds, ISO strings or nothing (meaning now); return epoch
+    seconds, or None for text that isn't a recognisable timestamp.
+    """
+    if value is None or value == "":
+        return time.time()
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return parse_pre_plain_text(f"[{value}]")[0] or None
@@ -11,20 +11,27 @@ from selenium.webdriver.common.keys import Keys
 import time
 
 import logging
+import os
+
+from messages import Message, DIRECTION_IN, DIRECTION_OUT
 _LOGGER = logging.getLogger(__name__)
 
+# Overridable so the client can be pointed at the offline fixture server
+# (see fixture_server.py) instead of the real WhatsApp Web.
+DEFAULT_BASE_URL = os.environ.get("WHATSAPP_WEB_URL", "https://web.whatsapp.com")
+
 class WhatsAppWebClient:
-    def __init__(self, user_data_dir=None):
+    def __init__(self, user_data_dir=None, base_url=None, day_first=True):
         self._driver = None
         self._user_data_dir = user_data_dir
+        self.base_url = base_url or DEFAULT_BASE_URL
+        # Locale hint for ambiguous dates in data-pre-plain-text (e.g. 03/04)
+        self.day_first = day_first
 
-    def get_qr_code_or_login(self):
+    def launch(self):
         """
-        Navigates to WhatsApp Web. If a session exists, it will be used.
-        If not, it will return a QR code for login.
-        Returns a tuple: (status, data)
-        status can be "logged_in" or "qr_code"
-        data is the QR code base64 string if status is "qr_code", otherwise None.
+        Starts Chrome and navigates to WhatsApp Web without waiting for the
+        page to settle. Use is_logged_in() / get_qr_code() to follow progress.
         """
         chrome_options = Options()
         chrome_options.add_argument("--headless")
@@ -32,7 +39,6 @@ class WhatsAppWebClient:
         chrome_options.add_argument("--disable-dev-shm-usage")
         
         # Check for common binary paths (especially for Home Assistant/Docker)
-        import os
         possible_binaries = [
             "/usr/bin/chromium-browser",
             "/usr/bin/chromium",
@@ -61,8 +67,35 @@ class WhatsAppWebClient:
                 _LOGGER.error(f"Fallback also failed: {e2}")
                 raise Exception("Google Chrome or Chromium is not installed or not found. Please install it on your Home Assistant server.")
         
-        self._driver.get("https://web.whatsapp.com")
-        
+        self._driver.get(self.base_url)
+
+    def get_qr_code(self):
+        """
+        Returns the QR code currently shown on the page as a base64 PNG,
+        or None if no QR canvas is present. Does not wait.
+        """
+        if not self._driver:
+            return None
+        qr_canvases = self._driver.find_elements(By.CSS_SELECTOR, "canvas")
+        if not qr_canvases:
+            return None
+        return self._driver.execute_script(
+            "return arguments[0].toDataURL('image/png').substring(21);",
+            qr_canvases[0]
+        )
+
+    def get_qr_code_or_login(self):
+        """
+        Navigates to WhatsApp Web. If a session exists, it will be used.
+        If not, it will return a QR code for login.
+        Returns a tuple: (status, data)
+        status can be "logged_in" or "qr_code"
+        data is the QR code base64 string if status is "qr_code", otherwise None.
+
+        Blocks for up to 40 seconds; the gateway uses LoginJob instead.
+        """
+        self.launch()
+
         # Check if we are already logged in
         try:
             # A selector that only exists when logged in
@@ -78,19 +111,9 @@ class WhatsAppWebClient:
 
         # If not logged in, get the QR code
         wait = WebDriverWait(self._driver, 30)
-        qr_canvas_selector = "canvas"
-        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, qr_canvas_selector)))
-        
-        self._driver.save_screenshot("debug_screenshot.png")
-        
-        qr_canvas = self._driver.find_element(By.CSS_SELECTOR, qr_canvas_selector)
-        
-        qr_base64 = self._driver.execute_script(
-            "return arguments[0].toDataURL('image/png').substring(21);", 
-            qr_canvas
-        )
+        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "canvas")))
 
-        return "qr_code", qr_base64
+        return "qr_code", self.get_qr_code()
 
     def send_message(self, contact_name, message):
         """
@@ -150,30 +173,38 @@ class WhatsAppWebClient:
             # A better way would be to just search and click.
             self.send_message(chat_name, "") 
 
-            message_selector = '.message-in, .message-out'
-            messages = self._driver.find_elements(By.CSS_SELECTOR, message_selector)
-            
-            parsed_messages = []
-            for msg in messages[-10:]: # Get last 10 messages
-                try:
-                    text_element = msg.find_element(By.CSS_SELECTOR, '.copyable-text')
-                    # The data-pre-plain-text attribute contains sender and time
-                    meta_data = text_element.get_attribute('data-pre-plain-text')
-                    text = text_element.text
-                    parsed_messages.append(f"{meta_data} {text}")
-                except:
-                    pass # Ignore messages that are not simple text
-            
-            return parsed_messages
+            return self._read_messages(chat_name, 10)
         except Exception as e:
             _LOGGER.error(f"Failed to get messages from {chat_name}: {e}")
             self._driver.save_screenshot(f"get_messages_error_{chat_name}.png")
             return []
 
+    def _read_messages(self, chat_name, limit):
+        """
+        Reads the last `limit` message bubbles of the open chat as Message records.
+        """
+        message_selector = '.message-in, .message-out'
+        messages = self._driver.find_elements(By.CSS_SELECTOR, message_selector)
+
+        parsed_messages = []
+        for msg in messages[-limit:]:
+            try:
+                text_element = msg.find_element(By.CSS_SELECTOR, '.copyable-text')
+                # The data-pre-plain-text attribute contains sender and time
+                meta_data = text_element.get_attribute('data-pre-plain-text')
+                direction = DIRECTION_OUT if "message-out" in (msg.get_attribute("class") or "") else DIRECTION_IN
+                parsed_messages.append(Message.from_pre_plain_text(
+                    chat_name, meta_data, text_element.text, direction, day_first=self.day_first
+                ))
+            except:
+                pass # Ignore messages that are not simple text
+
+        return parsed_messages
+
     def scrape_all_data(self):
         """
         Scrapes data from the top 10 chats.
-        Returns a dictionary: {chat_name: [messages]}
+        Returns a dictionary: {chat_name: [Message]}
         """
         if not self.is_logged_in():
              return {}
@@ -212,19 +243,7 @@ class WhatsAppWebClient:
                         chat_title = f"Unknown_Chat_{i}"
 
                     # Scrape messages
-                    message_selector = '.message-in, .message-out'
-                    messages = self._driver.find_elements(By.CSS_SELECTOR, message_selector)
-                    
-                    parsed_messages = []
-                    for msg in messages[-20:]: # Get last 20 messages
-                        try:
-                            text_element = msg.find_element(By.CSS_SELECTOR, '.copyable-text')
-                            meta_data = text_element.get_attribute('data-pre-plain-text')
-                            text = text_element.text
-                            parsed_messages.append(f"{meta_data} {text}")
-                        except:
-                            pass
-                    
+                    parsed_messages = self._read_messages(chat_title, 20)
                     data[chat_title] = parsed_messages
                     _LOGGER.info(f"Scraped {len(parsed_messages)} messages from {chat_title}")
 